@@ -2,26 +2,68 @@ from flask import Flask
 import json
 import os
 from app.extensions import db, bcrypt, login_manager, mail, migrate, init_db_with_retry
+from app import charts, instrumentation
+from app.chart_cache import chart_cache
+from app.rates import rate_provider
+from app.currency_loader import currency_catalogue
+from app.mailer import mail_worker
 
-def create_app():
+def create_app(config=None):
+    """Create the application. `config` overrides the settings of the JSON config file, e.g. for benchmarks."""
     app = Flask(__name__)
 
     # Load configuration from JSON file
     config_path = os.path.join(os.path.dirname(__file__), "../instance/configExpenseAnalyzer.json")
-    with open(config_path, "r") as config_file:
-        app.config.update(json.load(config_file))
+    if config is None or os.path.exists(config_path):
+        with open(config_path, "r") as config_file:
+            app.config.update(json.load(config_file))
+    app.config.update(config or {})
+
+    # Log at the configured level and time every request
+    instrumentation.init_app(app)
 
     # Initialize Flask extensions
     bcrypt.init_app(app)
     login_manager.init_app(app)
     mail.init_app(app)
+    chart_cache.init_app(app)
+    rate_provider.init_app(app)
+    currency_catalogue.init_app(app)
+
+    # Create the full-text search index along with the expenses table on new databases
+    from app import search  # noqa: F401
 
     # Initialize database with retry logic
     init_db_with_retry(app)  # 🔹 Ensures DB initialization with retries
 
+    # Bound the per-user budget and user state kept in memory
+    from app.models import BudgetSingleton, UserCache
+
+    BudgetSingleton.init_app(app)
+    UserCache.init_app(app)
+
+    # Resolve category names through a bounded cache, warmed with the most used categories
+    from app.multiton import ExpenseCategoryMultiton
+
+    ExpenseCategoryMultiton.init_app(app)
+
+    # Start delivering queued mail in the background
+    mail_worker.init_app(app)
+
+    # Redraw charts in the background after expense changes
+    from app.chart_prerender import chart_prerenderer
+
+    chart_prerenderer.init_app(app)
+
+    # Optionally preload the plotting libraries in the background
+    charts.init_app(app)
+
     # Configure login manager
     login_manager.login_view = "auth.login"
 
+    # Keep the expense rollups in sync with every flushed expense change
+    from app import rollups  # noqa: F401
+
     # Import and register blueprints
     from app.api.routes import api_bp
     from app.auth.routes import auth_bp
@@ -35,4 +77,11 @@ def create_app():
     app.register_blueprint(expenses_bp, url_prefix="/expenses")
     app.register_blueprint(main_bp)
 
+    # Register CLI commands
+    from app.cli import budgets_cli, expenses_cli, mail_cli
+
+    app.cli.add_command(expenses_cli)
+    app.cli.add_command(mail_cli)
+    app.cli.add_command(budgets_cli)
+
     return app
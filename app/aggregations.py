@@ -0,0 +1,83 @@
+from collections import namedtuple
+from sqlalchemy import String, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from .models import ExpenseRollup
+from .multiton import ExpenseCategoryMultiton
+from .extensions import db
+
+# Spending total for a single category, shaped like the rows of `get_category_data`
+CategoryTotal = namedtuple("CategoryTotal", ["category", "total"])
+
+# Everything the view expenses page reports about a user's spending
+ExpenseSummary = namedtuple("ExpenseSummary", ["count", "total", "months", "monthly_totals", "category_data"])
+
+
+class expense_month(FunctionElement):
+    """SQL expression formatting an expense date as its "YYYY-MM" month."""
+    type = String()
+    name = "expense_month"
+    inherit_cache = True
+
+
+@compiles(expense_month)
+def compile_expense_month(element, compiler, **kw):
+    """Fall back to the first seven characters of the ISO date."""
+    return "substr(CAST(%s AS VARCHAR(10)), 1, 7)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(expense_month, "sqlite")
+def compile_expense_month_sqlite(element, compiler, **kw):
+    """SQLite stores dates as ISO text, which `strftime` formats directly."""
+    month_format = compiler.render_literal_value("%Y-%m", String())
+    return "strftime(%s, %s)" % (month_format, compiler.process(element.clauses, **kw))
+
+
+@compiles(expense_month, "postgresql")
+def compile_expense_month_postgresql(element, compiler, **kw):
+    return "to_char(%s, 'YYYY-MM')" % compiler.process(element.clauses, **kw)
+
+
+@compiles(expense_month, "mysql")
+def compile_expense_month_mysql(element, compiler, **kw):
+    month_format = compiler.render_literal_value("%Y-%m", String())
+    return "DATE_FORMAT(%s, %s)" % (compiler.process(element.clauses, **kw), month_format)
+
+
+@compiles(expense_month, "mssql")
+def compile_expense_month_mssql(element, compiler, **kw):
+    """Style 126 is ISO 8601, so its first seven characters are "yyyy-mm"."""
+    return "CONVERT(CHAR(7), %s, 126)" % compiler.process(element.clauses, **kw)
+
+
+def get_expense_summary(user_id):
+    """
+    Compute the expense count, total, per-month and per-category sums for the user.
+    The user's rollup rows already hold one sum per month and category, so
+    they are folded into the summary without touching the expenses table.
+    """
+    rows = db.session.query(
+        ExpenseRollup.month, ExpenseRollup.category_id, ExpenseRollup.total, ExpenseRollup.count
+    ).filter(ExpenseRollup.user_id == user_id).all()
+
+    monthly_data = {}
+    category_data = {}
+    for row in rows:
+        monthly_data[row.month] = monthly_data.get(row.month, 0) + row.total
+        category_data[row.category_id] = category_data.get(row.category_id, 0) + row.total
+    names = ExpenseCategoryMultiton.names(category_data)
+
+    sorted_monthly_data = sorted(monthly_data.items())
+    return ExpenseSummary(
+        count=sum(row.count for row in rows),
+        total=sum(category_data.values()),
+        months=[month for month, _ in sorted_monthly_data],
+        monthly_totals=[total for _, total in sorted_monthly_data],
+        category_data=[CategoryTotal(names[category_id], total) for category_id, total in category_data.items()],
+    )
+
+
+def get_expense_total(user_id):
+    """Return the total spending of the user, summed over their rollup rows."""
+    total = db.session.query(func.sum(ExpenseRollup.total)).filter(ExpenseRollup.user_id == user_id).scalar()
+    return total or 0
@@ -0,0 +1,188 @@
+"""
+Spending analytics computed with NumPy.
+
+A user's recent expenses are loaded in one query as per-day, per-category sums
+and turned into arrays; every statistic below is then computed with vectorized
+array operations instead of Python loops over the rows. numpy is imported by
+this module, so import it lazily from request handlers.
+"""
+import calendar
+from collections import namedtuple
+from datetime import date
+import numpy as np
+from sqlalchemy import func, select
+from .extensions import db
+from .models import Budget, Expense
+from .multiton import ExpenseCategoryMultiton
+
+# A user's spending as parallel arrays: one entry per day and category with expenses
+SpendingSeries = namedtuple("SpendingSeries", ["days", "categories", "category_index", "amounts"])
+
+
+def load_series(user_id, since=None):
+    """Load the user's spending per day and category, from `since` on, into a SpendingSeries."""
+    query = select(Expense.date, Expense.category_id, func.sum(Expense.amount)).where(Expense.user_id == user_id)
+    if since is not None:
+        query = query.where(Expense.date >= since)
+    rows = db.session.execute(query.group_by(Expense.date, Expense.category_id)).all()
+    if not rows:
+        return SpendingSeries(np.array([], dtype="datetime64[D]"), np.array([], dtype=object), np.array([], dtype=np.intp), np.array([]))
+
+    days, category_ids, amounts = zip(*rows)
+    category_ids, category_index = np.unique(np.array(category_ids), return_inverse=True)
+    names = ExpenseCategoryMultiton.names(category_ids.tolist())
+    categories = np.array([names[category_id] for category_id in category_ids.tolist()], dtype=object)
+    return SpendingSeries(np.array(days, dtype="datetime64[D]"), categories, category_index, np.array(amounts, dtype=float))
+
+
+def resample(series, frequency):
+    """
+    Sum the spending per day ("D"), week starting on Monday ("W") or month ("M"), filling
+    periods without expenses with zero. Return the period start dates and their totals.
+    """
+    if not len(series.days):
+        return np.array([], dtype="datetime64[D]"), np.array([])
+    if frequency == "M":
+        periods = series.days.astype("datetime64[M]")
+    elif frequency == "W":
+        # 1970-01-01 was a Thursday, so shift by 3 days to start weeks on Monday
+        periods = series.days - (series.days.astype(np.int64) + 3) % 7
+    else:
+        periods = series.days
+
+    unit = "M" if frequency == "M" else "D"
+    step = 7 if frequency == "W" else 1
+    offsets = (periods - periods.min()).astype(np.int64) // step
+    totals = np.bincount(offsets, weights=series.amounts)
+    starts = periods.min() + np.arange(len(totals)) * np.timedelta64(step, unit)
+    return starts.astype("datetime64[D]"), totals
+
+
+def rolling_mean(values, window):
+    """Return the mean of every `window` consecutive values, NaN until a full window is available."""
+    means = np.full(len(values), np.nan)
+    if len(values) >= window:
+        cumulative = np.cumsum(np.insert(values, 0, 0.0))
+        means[window - 1:] = (cumulative[window:] - cumulative[:-window]) / window
+    return means
+
+
+def month_over_month(totals):
+    """Return the change of each month's total from the previous month, absolute and in percent (NaN from zero)."""
+    deltas = np.diff(totals)
+    previous = totals[:-1]
+    percent = np.divide(deltas * 100, previous, out=np.full(len(deltas), np.nan), where=previous > 0)
+    return deltas, percent
+
+
+def category_trends(series):
+    """
+    Sum the spending per category and month, and fit a least-squares line through each
+    category's monthly totals. Return the months, the categories, the (category x month)
+    totals and each category's slope in spending per month.
+    """
+    months = series.days.astype("datetime64[M]")
+    if not len(months):
+        return months, series.categories, np.zeros((0, 0)), np.array([])
+    month_index = (months - months.min()).astype(np.int64)
+    month_count = month_index.max() + 1
+    totals = np.bincount(
+        series.category_index * month_count + month_index,
+        weights=series.amounts,
+        minlength=len(series.categories) * month_count,
+    ).reshape(len(series.categories), month_count)
+
+    x = np.arange(month_count) - (month_count - 1) / 2
+    denominator = (x ** 2).sum()
+    slopes = (totals - totals.mean(axis=1, keepdims=True)) @ x / denominator if denominator else np.zeros(len(series.categories))
+    return months.min() + np.arange(month_count), series.categories, totals, slopes
+
+
+def project_month_end(series, today, monthly_limit=None):
+    """
+    Project the spending of the month of `today` by its last day.
+    The linear projection extrapolates the average daily spend so far. The seasonal one
+    divides the spend so far by the share of a month's spending that, on average over
+    the previous complete months, had been spent by this day of the month; it is used
+    once three such months exist.
+    """
+    days_in_month = calendar.monthrange(today.year, today.month)[1]
+    current_month = np.datetime64(today, "M")
+    months = series.days.astype("datetime64[M]")
+    day_of_month = (series.days - months).astype(np.int64) # 0 for the first day of the month
+
+    in_month = (months == current_month) & (day_of_month < today.day)
+    spent = float(series.amounts[in_month].sum())
+    linear = spent / today.day * days_in_month
+
+    # Spending per previous month and day of the month, then the share spent by today's day
+    previous = months < current_month
+    seasonal = None
+    history_months = 0
+    if previous.any():
+        month_index = (months[previous] - months[previous].min()).astype(np.int64)
+        daily = np.bincount(
+            month_index * 31 + day_of_month[previous],
+            weights=series.amounts[previous],
+            minlength=(month_index.max() + 1) * 31,
+        ).reshape(-1, 31)
+        month_totals = daily.sum(axis=1)
+        complete = month_totals > 0
+        history_months = int(complete.sum())
+        if history_months >= 3:
+            share = daily[complete, :today.day].sum(axis=1) / month_totals[complete]
+            mean_share = float(share.mean())
+            seasonal = spent / mean_share if mean_share > 0 else linear
+
+    projected = seasonal if seasonal is not None else linear
+    return {
+        "month": str(current_month),
+        "spent": round(spent, 2),
+        "days_elapsed": today.day,
+        "days_in_month": days_in_month,
+        "linear_projection": round(linear, 2),
+        "seasonal_projection": round(seasonal, 2) if seasonal is not None else None,
+        "projected": round(projected, 2),
+        "history_months": history_months,
+        "monthly_limit": monthly_limit,
+        "projected_overrun": round(projected - monthly_limit, 2) if monthly_limit else None,
+    }
+
+
+def get_spending_analytics(user_id, today=None, months=12, window=7):
+    """
+    Compute the analytics reported for a user over their last `months` months:
+    daily, weekly and monthly totals with rolling means, month-over-month changes,
+    per-category trends and the projected end-of-month spend against their budget.
+    """
+    today = today or date.today()
+    first_month = (np.datetime64(today, "M") - np.timedelta64(months - 1, "M")).astype("datetime64[D]").item()
+    series = load_series(user_id, since=first_month)
+    monthly_limit = db.session.query(Budget.monthly_limit).filter_by(user_id=user_id).scalar()
+
+    day_starts, daily = resample(series, "D")
+    week_starts, weekly = resample(series, "W")
+    month_starts, monthly = resample(series, "M")
+    deltas, percent = month_over_month(monthly)
+    trend_months, categories, category_totals, slopes = category_trends(series)
+
+    def as_list(values):
+        """Convert an array to a JSON-friendly list, with None for NaN."""
+        return [None if value != value else round(float(value), 2) for value in values.tolist()]
+
+    return {
+        "daily": {"dates": day_starts.astype(str).tolist(), "totals": as_list(daily), "rolling_mean": as_list(rolling_mean(daily, window))},
+        "weekly": {"dates": week_starts.astype(str).tolist(), "totals": as_list(weekly), "rolling_mean": as_list(rolling_mean(weekly, 4))},
+        "monthly": {
+            "months": month_starts.astype("datetime64[M]").astype(str).tolist(),
+            "totals": as_list(monthly),
+            "change": as_list(deltas),
+            "change_percent": as_list(percent),
+        },
+        "category_trends": [
+            {"category": category, "totals": as_list(totals), "slope": round(float(slope), 2)}
+            for category, totals, slope in zip(categories.tolist(), category_totals, slopes)
+        ],
+        "trend_months": trend_months.astype(str).tolist(),
+        "projection": project_month_end(series, today, monthly_limit),
+    }
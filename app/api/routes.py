@@ -1,5 +1,15 @@
-from flask import Blueprint, jsonify, render_template, request
-from ..currency_loader import load_currency_data
+from functools import wraps
+from flask import Blueprint, abort, current_app, jsonify, render_template, request, url_for
+from flask_login import current_user
+from ..aggregations import get_expense_summary
+from ..chart_prerender import chart_prerenderer
+from ..currency_loader import currency_catalogue
+from ..extensions import db
+from ..importers import ImportRowError, insert_expenses, validate_row
+from ..models import Expense
+from ..pagination import InvalidCursor, get_expense_page, requested_page_size
+from ..search import parse_search_args, search_expenses
+from ..serializers import EXPENSE_FIELDS, serialize_expense
 from ..utils import get_currency_conversion, get_cad_usd_forecast
 
 api_bp = Blueprint("api", __name__)
@@ -20,11 +30,21 @@ def convert_currency():
     return render_template(
         "view_expenses.html",
         conversion_rate=conversion,
-        selected_from=from_currency,
-        selected_to=to_currency,
-        currency_data=load_currency_data(),  # Ensure currency data is loaded
+        from_currency=from_currency,
+        to_currency=to_currency,
+        currency_catalogue=currency_catalogue,  # Preloaded at startup
     )
 
+@api_bp.route("/currencies")
+def currencies():
+    """Route to list the supported currencies. Returns a JSON response the browser may cache for a day."""
+    response = jsonify({"currencies": currency_catalogue.to_json()})
+    response.add_etag()
+    response.cache_control.public = True
+    response.cache_control.max_age = 86400
+    return response.make_conditional(request)
+
+
 @api_bp.route("/get_forecast")
 def get_forecast():
     """Route to get the CAD-USD forecast. Returns a JSON response."""
@@ -38,3 +58,265 @@ def get_forecast():
         return jsonify({"error": "Forecast data not available"}), 404
 
     return jsonify({"forecast": forecast})
+
+
+# Fields that can be requested with the `fields` parameter, besides EXPENSE_FIELDS
+SUMMARY_FIELDS = ("count", "total", "monthly", "categories", "budget")
+ANALYTICS_FIELDS = ("daily", "weekly", "monthly", "category_trends", "trend_months", "projection")
+
+
+def api_login_required(view):
+    """Like `login_required`, but answer with a JSON 401 instead of redirecting to the login page."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify({"error": "Authentication required."}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def api_write_allowed(view):
+    """Reject changes to the shared Guest account, like the HTML routes do."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if current_user.username == "Guest":
+            return jsonify({"error": "Guest users cannot change expenses."}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def requested_fields(allowed):
+    """Return the fields selected by the `fields` parameter (comma-separated), or all of them."""
+    fields = request.args.get("fields")
+    if not fields:
+        return allowed
+    fields = tuple(field.strip() for field in fields.split(",") if field.strip())
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        abort(make_error(f"Unknown fields: {', '.join(unknown)}.", 400))
+    return fields
+
+
+def make_error(message, status):
+    """Build a JSON error response."""
+    response = jsonify({"error": message})
+    response.status_code = status
+    return response
+
+
+def conditional_json(payload):
+    """
+    Build a JSON response with an ETag of its content, answered with 304 Not Modified
+    when the client already holds the same representation.
+    """
+    response = jsonify(payload)
+    response.add_etag()
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def validate_payload(payload):
+    """Validate a JSON expense object with the import rules. Return its column values or raise ImportRowError."""
+    if not isinstance(payload, dict):
+        raise ImportRowError("expected a JSON object")
+    return validate_row({key: "" if value is None else str(value) for key, value in payload.items()})
+
+
+def get_own_expense(expense_id):
+    """Return the expense of the current user, or abort with 404 (also for other users' expenses)."""
+    expense = db.session.get(Expense, expense_id)
+    if expense is None or expense.user_id != current_user.id:
+        abort(make_error("Expense not found.", 404))
+    return expense
+
+
+def commit_expense_change():
+    """Commit the pending expense change, redrawing the user's charts in the background once it is committed."""
+    chart_prerenderer.schedule_after_commit(current_user.id)
+    db.session.commit()
+
+
+@api_bp.route("/expenses", methods=["GET"])
+@api_login_required
+def list_expenses():
+    """Route to list the expenses of the current user, newest first, one keyset page at a time. Returns a JSON response."""
+    fields = requested_fields(EXPENSE_FIELDS)
+    page_size = requested_page_size()
+    try:
+        expenses, next_cursor = get_expense_page(current_user.id, request.args.get("cursor"), page_size)
+    except InvalidCursor as e:
+        return make_error(str(e), 400)
+
+    return conditional_json({
+        "expenses": [serialize_expense(expense, fields) for expense in expenses],
+        "next_cursor": next_cursor,
+        "next_url": url_for(
+            "api.list_expenses", cursor=next_cursor, limit=page_size, fields=request.args.get("fields")
+        ) if next_cursor else None,
+    })
+
+
+@api_bp.route("/expenses/search")
+@api_login_required
+def search_expense_list():
+    """
+    Route to search the expenses of the current user by words in their name or category (`q`),
+    within `start`/`end` dates, `min_amount`/`max_amount` and `category` filters, newest first,
+    one keyset page at a time, with the number of matches per category and month. Returns a JSON response.
+    """
+    fields = requested_fields(EXPENSE_FIELDS)
+    page_size = requested_page_size()
+    try:
+        result = search_expenses(current_user.id, **parse_search_args(request.args), cursor=request.args.get("cursor"), page_size=page_size)
+    except ValueError as e: # Includes InvalidCursor
+        return make_error(str(e), 400)
+
+    return conditional_json({
+        "expenses": [serialize_expense(expense, fields) for expense in result.expenses],
+        "total": result.total,
+        "facets": {
+            "categories": [{"category": category, "count": count} for category, count in result.category_counts],
+            "months": [{"month": month, "count": count} for month, count in result.month_counts],
+        },
+        "next_cursor": result.next_cursor,
+        "next_url": url_for(
+            "api.search_expense_list", **{**request.args.to_dict(flat=False), "cursor": result.next_cursor}
+        ) if result.next_cursor else None,
+    })
+
+
+@api_bp.route("/expenses", methods=["POST"])
+@api_login_required
+@api_write_allowed
+def create_expense():
+    """Route to create an expense for the current user from a JSON object. Returns the created expense."""
+    try:
+        values = validate_payload(request.get_json(silent=True))
+    except ImportRowError as e:
+        return make_error(str(e), 400)
+
+    expense = Expense(user_id=current_user.id, **values)
+    db.session.add(expense)
+    if current_user.budget:
+        current_user.budget.update_total(expense.amount)
+    commit_expense_change()
+
+    response = jsonify(serialize_expense(expense))
+    response.status_code = 201
+    response.headers["Location"] = url_for("api.get_expense", expense_id=expense.id)
+    return response
+
+
+@api_bp.route("/expenses/bulk", methods=["POST"])
+@api_login_required
+@api_write_allowed
+def bulk_create_expenses():
+    """
+    Route to create many expenses for the current user from a JSON array.
+    Either every expense is valid and they are all inserted in one batch, or nothing is inserted.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, list) or not payload:
+        return make_error("Expected a non-empty JSON array of expenses.", 400)
+    max_size = current_app.config.get("API_BULK_MAX_SIZE", 1000)
+    if len(payload) > max_size:
+        return make_error(f"At most {max_size} expenses can be created at once.", 413)
+
+    expenses = []
+    errors = []
+    for index, item in enumerate(payload):
+        try:
+            expenses.append(dict(validate_payload(item), user_id=current_user.id))
+        except ImportRowError as e:
+            errors.append({"index": index, "error": str(e)})
+    if errors:
+        return jsonify({"error": "Invalid expenses.", "errors": errors}), 400
+
+    return jsonify({"created": insert_expenses(current_user.id, expenses)}), 201
+
+
+@api_bp.route("/expenses/<int:expense_id>", methods=["GET"])
+@api_login_required
+def get_expense(expense_id):
+    """Route to get one expense of the current user. Returns a JSON response."""
+    return conditional_json(serialize_expense(get_own_expense(expense_id), requested_fields(EXPENSE_FIELDS)))
+
+
+@api_bp.route("/expenses/<int:expense_id>", methods=["PATCH"])
+@api_login_required
+@api_write_allowed
+def update_expense(expense_id):
+    """Route to update some fields of an expense of the current user. Returns the updated expense."""
+    expense = get_own_expense(expense_id)
+    changes = request.get_json(silent=True)
+    if not isinstance(changes, dict) or set(changes) - {"name", "amount", "category", "date"}:
+        return make_error("Expected a JSON object with name, amount, category or date.", 400)
+    try:
+        values = validate_payload(dict(serialize_expense(expense), **changes))
+    except ImportRowError as e:
+        return make_error(str(e), 400)
+
+    old_amount = expense.amount
+    for field in changes:
+        # The validated values hold the category as the ID of its row
+        column = "category_id" if field == "category" else field
+        setattr(expense, column, values[column])
+    if current_user.budget and expense.amount != old_amount:
+        current_user.budget.update_total(expense.amount - old_amount)
+    commit_expense_change()
+    return jsonify(serialize_expense(expense))
+
+
+@api_bp.route("/expenses/<int:expense_id>", methods=["DELETE"])
+@api_login_required
+@api_write_allowed
+def delete_expense(expense_id):
+    """Route to delete an expense of the current user."""
+    expense = get_own_expense(expense_id)
+    if current_user.budget:
+        current_user.budget.update_total(-expense.amount)
+    db.session.delete(expense)
+    commit_expense_change()
+    return "", 204
+
+
+@api_bp.route("/expenses/summary")
+@api_login_required
+def expense_summary():
+    """Route to get the totals the view expenses page shows, per month and per category. Returns a JSON response."""
+    fields = requested_fields(SUMMARY_FIELDS)
+    summary = get_expense_summary(current_user.id)
+    budget = current_user.budget
+    values = {
+        "count": summary.count,
+        "total": summary.total,
+        "monthly": [{"month": month, "total": total} for month, total in zip(summary.months, summary.monthly_totals)],
+        "categories": [{"category": category, "total": total} for category, total in summary.category_data],
+        "budget": {
+            "monthly_limit": budget.monthly_limit,
+            "current_expense_total": budget.current_expense_total,
+            "month": budget.month,
+            "month_total": budget.month_total,
+        } if budget else None,
+    }
+    return conditional_json({field: values[field] for field in fields})
+
+
+@api_bp.route("/expenses/analytics")
+@api_login_required
+def expense_analytics():
+    """
+    Route to get the spending trends and the projected end-of-month spend of the user,
+    over the last `months` months (12 by default) with `window`-day rolling means (7 by default).
+    Returns a JSON response.
+    """
+    from ..analytics import get_spending_analytics # Loads numpy, so only once analytics are requested
+
+    fields = requested_fields(ANALYTICS_FIELDS)
+    months = request.args.get("months", 12, type=int)
+    window = request.args.get("window", 7, type=int)
+    if not 1 <= months <= 120 or not 1 <= window <= 90:
+        return make_error("months must be between 1 and 120 and window between 1 and 90.", 400)
+    analytics = get_spending_analytics(current_user.id, months=months, window=window)
+    return conditional_json({field: analytics[field] for field in fields})
@@ -30,8 +30,9 @@ def register():
         hashed_password = bcrypt.generate_password_hash(form.password.data).decode("utf-8")
         user = User(username=form.username.data, email=form.email.data, password=hashed_password)
         db.session.add(user)
-        db.session.commit()
+        db.session.flush()  # Assign the user ID the activation token is made from
         send_activation_email(user)
+        db.session.commit()
         flash("Please check your email to activate your account.", "info")
         return redirect(url_for("auth.login"))
     # Render the registration form
@@ -95,4 +96,4 @@ def guest_login():
     # Log in the Guest user
     login_user(guest_user)
     flash("You are logged in as a guest.", "info")
-    return redirect(url_for('expenses.view_expenses'))
\ No newline at end of file
+    return redirect(url_for('expenses.view_expenses'))
\ No newline at end of file
@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from ..models import Budget, BudgetSingleton
+from ..aggregations import get_expense_total
 from ..extensions import db
 from flask_login import login_required, current_user
 
@@ -12,12 +13,13 @@ def set_budget():
     """Route to set the budget for the current user."""
     if request.method == "POST":
         monthly_limit = float(request.form["monthly_limit"])
-        total_spending = sum(expense.amount for expense in current_user.expenses)
+        total_spending = get_expense_total(current_user.id)
 
         if current_user.budget:
             current_user.budget.monthly_limit = monthly_limit
             current_user.budget.current_expense_total = total_spending
             current_user.budget.reset_alert()
+            current_user.budget.roll_over() # Recount this month's spending
         else:
             # Create a new budget instance with the current spending total
             current_user.budget = Budget(
@@ -26,12 +28,12 @@ def set_budget():
                 alert_sent=False,
                 user_id=current_user.id,
             )
+            current_user.budget.roll_over() # Count this month's spending
             db.session.add(current_user.budget)
 
-        db.session.commit()
-
-        # Notify observers via Singleton
+        # Notify observers via Singleton, then commit everything at once
         BudgetSingleton.get_instance(current_user.id).update(current_user.budget)
+        db.session.commit()
 
         flash("Budget set successfully!", "success")
         return redirect(url_for("expenses.view_expenses"))
@@ -49,10 +51,10 @@ def update_budget():
         # Update the budget in the database
         current_user.budget.monthly_limit = monthly_limit
         current_user.budget.reset_alert()  # Reset alert flag
-        db.session.commit()
 
-        # Synchronize the singleton with the updated budget
+        # Synchronize the singleton with the updated budget, then commit everything at once
         BudgetSingleton.get_instance(current_user.id).update(current_user.budget)
+        db.session.commit()
 
         flash("Budget updated successfully!", "success")
         return redirect(url_for("expenses.view_expenses"))
@@ -0,0 +1,92 @@
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+from .instrumentation import timed
+
+# A rendered chart together with the data version it was drawn from and when it was rendered
+CachedChart = namedtuple("CachedChart", ["content", "version", "rendered_at"])
+
+
+class ChartCache:
+    """
+    LRU cache holding the latest rendered version of each (user_id, chart type).
+    The data version is a digest of the aggregated data the chart is drawn from,
+    so a cached chart is only served as current for the data it was rendered from;
+    the previous version stays available while a newer one is being rendered.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict() # Maps (user_id, chart_type) to the latest rendered chart.
+        self._size = 0 # Total size of the cached charts in bytes.
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Read the cache bounds from the application config."""
+        self.max_entries = app.config.get("CHART_CACHE_MAX_ENTRIES", self.max_entries)
+        self.max_bytes = app.config.get("CHART_CACHE_MAX_BYTES", self.max_bytes)
+
+    @staticmethod
+    def data_version(*data):
+        """Return a short digest identifying the data a chart is rendered from."""
+        normalized = repr([list(part) for part in data])
+        return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+    def get(self, user_id, chart_type, version):
+        """Return the cached chart if it was rendered from the data version, otherwise None."""
+        with self._lock:
+            chart = self._entries.get((user_id, chart_type))
+            if chart is None or chart.version != version:
+                return None
+            self._entries.move_to_end((user_id, chart_type)) # Mark the entry as most recently used.
+            return chart
+
+    def latest(self, user_id, chart_type):
+        """Return the most recently rendered chart, whatever data version it was rendered from, or None."""
+        with self._lock:
+            return self._entries.get((user_id, chart_type))
+
+    def get_or_render(self, user_id, chart_type, render, *data):
+        """Return the cached chart for the data, calling `render(*data)` only on a miss."""
+        version = self.data_version(*data)
+        chart = self.get(user_id, chart_type, version)
+        if chart is not None:
+            return chart
+
+        # Render outside the lock so a slow render does not block other users
+        with timed("chart"):
+            content = render(*data)
+        chart = CachedChart(content, version, datetime.now(timezone.utc).replace(microsecond=0))
+
+        with self._lock:
+            # Replace the previous version of the chart
+            previous = self._entries.pop((user_id, chart_type), None)
+            if previous is not None:
+                self._size -= len(previous.content)
+            self._entries[(user_id, chart_type)] = chart
+            self._size += len(chart.content)
+            self._evict()
+        return chart
+
+    def invalidate(self, user_id):
+        """Drop every cached chart for the user after their expenses change."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                self._size -= len(self._entries.pop(key).content)
+
+    def clear(self):
+        """Drop every cached chart."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _evict(self):
+        """Evict least recently used charts until the cache is within its bounds."""
+        while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+            _, chart = self._entries.popitem(last=False)
+            self._size -= len(chart.content)
+
+
+chart_cache = ChartCache()
@@ -0,0 +1,90 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .chart_cache import chart_cache
+from .charts import get_renderer
+from .unit_of_work import after_commit
+from .utils import get_category_data, get_monthly_data
+
+logger = logging.getLogger(__name__)
+
+
+def render_user_charts(user_id, renderer):
+    """Render the charts of the user with the renderer into the chart cache, unless they are already cached."""
+    category_data = get_category_data(user_id)
+    months, totals = get_monthly_data(user_id)
+    if not category_data:
+        return # No expenses, so there are no charts to draw
+    chart_cache.get_or_render(user_id, f"pie.{renderer.extension}", renderer.pie, category_data)
+    chart_cache.get_or_render(user_id, f"bar.{renderer.extension}", renderer.bar, months, totals)
+
+
+class ChartPrerenderer:
+    """
+    Re-renders a user's charts on a bounded thread pool after their expenses change,
+    so the page the write redirects to does not wait for the charts to be drawn.
+    Jobs are coalesced per user: a change arriving while the user's charts are being
+    rendered schedules a single re-render once the current one finishes.
+    """
+
+    def __init__(self, max_workers=2, max_pending=64):
+        self.app = None
+        self.enabled = True
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._pending = set() # Users whose charts are waiting for or being rendered.
+        self._dirty = set() # Users whose expenses changed again during their render.
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Read the pre-rendering settings from the application config and create the thread pool."""
+        self.app = app
+        self.enabled = app.config.get("CHART_PRERENDER", self.enabled)
+        self.max_workers = app.config.get("CHART_PRERENDER_WORKERS", self.max_workers)
+        self.max_pending = app.config.get("CHART_PRERENDER_MAX_PENDING", self.max_pending)
+        if self.enabled and self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="chart-prerender")
+
+    def schedule(self, user_id):
+        """
+        Queue a re-render of the user's charts. Return False if pre-rendering is disabled
+        or the queue is full, in which case the charts are rendered on their next request.
+        """
+        if not self.enabled or self._executor is None:
+            return False
+        with self._lock:
+            if user_id in self._pending:
+                self._dirty.add(user_id)
+                return True
+            if len(self._pending) >= self.max_pending:
+                return False
+            self._pending.add(user_id)
+        self._executor.submit(self._run, user_id)
+        return True
+
+    def schedule_after_commit(self, user_id):
+        """Queue a re-render of the user's charts once the current transaction commits."""
+        after_commit(lambda: self.schedule(user_id))
+
+    def is_pending(self, user_id):
+        """Return whether the user's charts are waiting for or being re-rendered."""
+        with self._lock:
+            return user_id in self._pending
+
+    def _run(self, user_id):
+        """Render the user's charts until no further change arrived during the render."""
+        while True:
+            try:
+                with self.app.app_context():
+                    render_user_charts(user_id, get_renderer(self.app.config.get("CHART_RENDERER")))
+            except Exception:
+                logger.exception("Pre-rendering the charts of user %s failed", user_id)
+            with self._lock:
+                if user_id not in self._dirty:
+                    self._pending.discard(user_id)
+                    return
+                self._dirty.discard(user_id)
+
+
+chart_prerenderer = ChartPrerenderer()
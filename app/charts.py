@@ -0,0 +1,149 @@
+import io
+import threading
+import time
+from collections import namedtuple
+from functools import lru_cache
+from . import svg_charts
+
+
+@lru_cache(maxsize=None)
+def load_plotting():
+    """
+    Import matplotlib and numpy on first use and return (Figure, FigureCanvasAgg, colormaps, numpy).
+    Importing them and building the font cache takes a large share of the startup
+    time, so they are only loaded when the first chart is rendered or warmed up.
+    Only the object-oriented API is used: pyplot's global figure manager is not
+    thread-safe, so it must not be touched from threaded workers.
+    """
+    from matplotlib import colormaps
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    import numpy as np
+    return Figure, FigureCanvasAgg, colormaps, np
+
+
+# Figures of each thread, reused across renders instead of allocating new ones
+_figures = threading.local()
+
+
+def get_figure(kind, figsize):
+    """
+    Return this thread's figure for a kind of chart, cleared and ready to draw on.
+    A figure is only ever used by the thread that created it, so renders running
+    in parallel never share matplotlib state.
+    """
+    pool = _figures.__dict__.setdefault("pool", {})
+    if kind not in pool:
+        Figure, FigureCanvasAgg, _, _ = load_plotting()
+        figure = Figure(figsize=figsize)
+        FigureCanvasAgg(figure) # Attach an Agg canvas for rendering to PNG
+        pool[kind] = figure, vars(figure.subplotpars).copy()
+        return figure
+
+    figure, subplotpars = pool[kind]
+    figure.clear()
+    figure.subplotpars.update(**subplotpars) # Undo the layout of the previous render
+    return figure
+
+
+def render_png(figure):
+    """Return the figure rendered as PNG bytes."""
+    buffer = io.BytesIO() # Create a buffer to hold the image data
+    figure.savefig(buffer, format="png") # Save the image data to the buffer
+    return buffer.getvalue()
+
+
+def warm_up():
+    """Load the plotting libraries and render a throwaway chart so the first real chart is fast."""
+    create_bar_chart(["warm-up"], [1.0])
+
+
+def init_app(app):
+    """
+    Warm up the matplotlib renderer in the background when CHART_WARMUP is enabled.
+    The warm-up waits CHART_WARMUP_DELAY seconds, so it runs once the app is serving requests.
+    """
+    if not app.config.get("CHART_WARMUP", False) or get_renderer(app.config.get("CHART_RENDERER")).extension != "png":
+        return
+    delay = app.config.get("CHART_WARMUP_DELAY", 1)
+
+    def run():
+        time.sleep(delay)
+        warm_up()
+
+    threading.Thread(target=run, name="chart-warmup", daemon=True).start()
+
+
+def create_pie_chart(category_data):
+    """Generates a pie chart showing category spending distribution."""
+    _, _, colormaps, np = load_plotting()
+    labels = [item.category for item in category_data]
+    sizes = [item.total for item in category_data]
+
+    # Grouping smaller categories into "Other"
+    threshold = 5  # minimum percentage to avoid grouping
+    labels, sizes = zip(
+        *(
+            (label, size) if size / sum(sizes) * 100 > threshold else ("Other", size)
+            for label, size in zip(labels, sizes)
+        )
+    )
+
+    figure = get_figure("pie", (8, 6))
+    axes = figure.add_subplot()
+    colors = colormaps["Paired"](np.linspace(0, 1, len(set(labels))))
+    axes.pie(
+        sizes,
+        labels=labels,
+        autopct="%1.1f%%",
+        startangle=140,
+        shadow=True,
+        colors=colors,
+        explode=[0.1 if size == max(sizes) else 0 for size in sizes],
+    )
+    axes.set_title("Category Spending Distribution", fontsize=14, pad=20)
+    axes.axis("equal")
+    axes.legend(loc="lower right", bbox_to_anchor=(0.64, -0.1, 0.5, 0.5), fontsize=10)
+    figure.tight_layout()
+    # Return the PNG bytes of the pie chart
+    return render_png(figure)
+
+
+def create_bar_chart(months, totals):
+    """Generates a bar chart comparing monthly expenses."""
+    _, _, colormaps, np = load_plotting()
+    figure = get_figure("bar", (10, 6))
+    axes = figure.add_subplot()
+    colors = colormaps["Blues"](np.linspace(0.4, 1, len(totals)))
+    axes.bar(months, totals, color=colors, edgecolor="black")
+
+    axes.set_xlabel("Month", fontsize=12)
+    axes.set_xticks(range(len(months)), months, rotation=45, ha="right")
+    axes.set_ylabel("Total Spending", fontsize=12)
+    axes.set_ylim(0, max(totals) + 100)
+    axes.set_yticks(np.arange(0, max(totals) + 100, step=100))
+    axes.set_title("Monthly Expense Comparison", fontsize=14)
+
+    # Add values on top of each bar
+    for i, total in enumerate(totals):
+        axes.text(i, total + 10, f"{total:.2f}", ha="center", fontsize=9)
+
+    axes.grid(axis="y", linestyle="--", alpha=0.7)
+    # Return the PNG bytes of the bar chart
+    return render_png(figure)
+
+
+# Chart backend: the MIME type and file extension of its output and its two chart functions
+ChartRenderer = namedtuple("ChartRenderer", ["mimetype", "extension", "pie", "bar"])
+
+RENDERERS = {
+    "svg": ChartRenderer("image/svg+xml", "svg", svg_charts.create_pie_chart, svg_charts.create_bar_chart),
+    "matplotlib": ChartRenderer("image/png", "png", create_pie_chart, create_bar_chart),
+}
+
+RENDERERS_BY_EXTENSION = {renderer.extension: renderer for renderer in RENDERERS.values()}
+
+
+def get_renderer(name):
+    """Return the chart renderer selected by CHART_RENDERER (SVG by default), falling back to matplotlib."""
+    return RENDERERS.get(name or "svg", RENDERERS["matplotlib"])
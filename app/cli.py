@@ -0,0 +1,161 @@
+import click
+from datetime import datetime
+from dateutil import parser as date_parser
+from flask.cli import AppGroup
+from sqlalchemy import String, cast, column, select, table, update
+from .extensions import db
+from .exporters import EXPORT_FORMATS, stream_expenses
+from .importers import PARSERS, detect_format, import_expenses
+from .mailer import mail_worker
+from .models import Budget
+from .multiton import ExpenseCategoryMultiton
+from .rollups import find_rollup_mismatches, rebuild_rollups
+
+expenses_cli = AppGroup("expenses", help="Maintenance commands for expense data.")
+mail_cli = AppGroup("mail", help="Commands for the outgoing mail queue.")
+budgets_cli = AppGroup("budgets", help="Maintenance commands for budgets.")
+
+# The raw expenses table, so legacy rows can be read before the column types change
+expenses_table = table("expenses", column("id"), column("date"), column("amount"))
+
+
+@expenses_cli.command("backfill")
+@click.option("--batch-size", default=1000, show_default=True, help="Rows to update per transaction.")
+def backfill_expenses(batch_size):
+    """
+    Normalize legacy expense rows before migrating to DATE/NUMERIC columns.
+    Rewrite every date into ISO "YYYY-MM-DD" form and round every amount to cents,
+    committing in batches of primary keys so no long-running lock is held.
+    """
+    last_id = 0
+    updated = unparseable = 0
+    while True:
+        rows = db.session.execute(
+            select(expenses_table.c.id, cast(expenses_table.c.date, String(50)).label("date"), expenses_table.c.amount)
+            .where(expenses_table.c.id > last_id)
+            .order_by(expenses_table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+
+        for row in rows:
+            values = {}
+            iso_date = normalize_date(row.date)
+            if iso_date is None:
+                unparseable += 1
+                click.echo(f"Expense {row.id}: cannot parse date {row.date!r}", err=True)
+            elif iso_date != row.date:
+                values["date"] = iso_date
+            if row.amount != round(row.amount, 2):
+                values["amount"] = round(row.amount, 2)
+            if values:
+                db.session.execute(update(expenses_table).where(expenses_table.c.id == row.id).values(**values))
+                updated += 1
+
+        db.session.commit()
+        last_id = rows[-1].id
+
+    click.echo(f"Backfilled {updated} expenses; {unparseable} dates could not be parsed.")
+    if unparseable:
+        raise SystemExit(1) # The DATE migration would fail on these rows
+
+
+@expenses_cli.command("rebuild-rollups")
+@click.option("--user-id", type=int, help="Only rebuild the rollups of this user.")
+@click.option("--check", is_flag=True, help="Only report rollups that differ from the expenses, without rebuilding.")
+def rebuild_expense_rollups(user_id, check):
+    """Recompute the monthly/category rollups from the expenses table."""
+    connection = db.session.connection()
+    if check:
+        mismatches = find_rollup_mismatches(connection, user_id)
+        names = ExpenseCategoryMultiton.names(category_id for _, _, category_id in mismatches)
+        for user, month, category_id in mismatches:
+            click.echo(f"Mismatch: user={user} month={month} category={names.get(category_id)!r}")
+        click.echo(f"{len(mismatches)} rollup rows differ from the expenses.")
+        if mismatches:
+            raise SystemExit(1)
+        return
+
+    rows = rebuild_rollups(connection, user_id)
+    db.session.commit()
+    click.echo(f"Rebuilt {rows} rollup rows.")
+
+
+@expenses_cli.command("import")
+@click.argument("file", type=click.File("rb"))
+@click.option("--user-id", type=int, required=True, help="User the expenses belong to.")
+@click.option("--format", "file_format", type=click.Choice(sorted(PARSERS)), help="File format, detected from the extension by default.")
+@click.option("--batch-size", default=1000, show_default=True, help="Rows to insert per batch.")
+def import_expenses_command(file, user_id, file_format, batch_size):
+    """Import expenses from a CSV or OFX file, streaming it in batches."""
+    file_format = file_format or detect_format(file.name)
+    if file_format is None:
+        raise click.UsageError("Cannot detect the file format, please pass --format.")
+
+    result = import_expenses(user_id, PARSERS[file_format](file), batch_size=batch_size)
+    for error in result.errors:
+        click.echo(error, err=True)
+    click.echo(
+        f"Imported {result.imported} expenses, skipped {result.skipped}, "
+        f"in {result.elapsed:.2f}s ({result.rows_per_second:.0f} rows/s)."
+    )
+
+
+@expenses_cli.command("export")
+@click.option("--user-id", type=int, required=True, help="User whose expenses are exported.")
+@click.option("--format", "file_format", type=click.Choice(sorted(EXPORT_FORMATS)), default="csv", show_default=True)
+@click.option("--output", type=click.Path(dir_okay=False, writable=True), default="-", help="Output file, stdout by default.")
+@click.option("--start", type=click.DateTime(["%Y-%m-%d"]), help="Only export expenses on or after this date.")
+@click.option("--end", type=click.DateTime(["%Y-%m-%d"]), help="Only export expenses on or before this date.")
+@click.option("--category", "categories", multiple=True, help="Only export these categories; may be repeated.")
+def export_expenses_command(user_id, file_format, output, start, end, categories):
+    """Export the expenses of a user, streaming them in batches."""
+    writer = EXPORT_FORMATS[file_format][0]
+    rows = stream_expenses(user_id, start and start.date(), end and end.date(), list(categories))
+    with click.open_file(output, "wb") as file:
+        for chunk in writer(rows):
+            file.write(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+
+
+def normalize_date(value):
+    """Return the ISO "YYYY-MM-DD" form of a stored date string, or None if it is not a date."""
+    value = value.strip()
+    try:
+        return datetime.strptime(value[:10], "%Y-%m-%d").date().isoformat()
+    except ValueError:
+        pass
+    try:
+        return date_parser.parse(value).date().isoformat()
+    except (ValueError, OverflowError):
+        return None
+
+
+@mail_cli.command("send")
+def send_pending_mail():
+    """Deliver every due message in the outbox now, e.g. when the mail worker is disabled."""
+    attempted = 0
+    while True:
+        batch = mail_worker.deliver_pending()
+        attempted += batch
+        if batch < mail_worker.batch_size:
+            break
+    click.echo(f"Attempted delivery of {attempted} messages.")
+
+
+@budgets_cli.command("rollover")
+@click.option("--month", help='Month to start tracking, as "YYYY-MM"; the current month by default.')
+def roll_over_budgets(month):
+    """
+    Start tracking the new month in every budget, counting the spending already recorded
+    for it, with one set-based UPDATE. Schedule it shortly after midnight on the first of
+    each month; budgets not yet rolled over are also rolled over on their next change.
+    """
+    if month:
+        try:
+            datetime.strptime(month, "%Y-%m")
+        except ValueError:
+            raise click.BadParameter('expected "YYYY-MM"', param_hint="--month")
+    rolled_over = Budget.roll_over_all(month)
+    db.session.commit()
+    click.echo(f"Rolled over {rolled_over} budgets.")
@@ -1,10 +1,78 @@
+import os
+from collections import namedtuple
+from types import MappingProxyType
 import yaml
+from markupsafe import Markup
 
-def load_currency_data():
+CURRENCY_FILE = os.path.join(os.path.dirname(__file__), "data", "currencies.yml")
+
+# A supported currency and the country it belongs to
+Currency = namedtuple("Currency", ["country", "currency_code"])
+
+
+def load_currency_data(path=CURRENCY_FILE):
     """Load currency data from YAML, sorted by country name."""
-    with open("app/data/currencies.yml", "r") as file:
+    with open(path, "r") as file:
         currency_data = yaml.safe_load(file)
     # Sort currencies by country name
     currency_data["currencies"].sort(key=lambda x: x["country"])
     # Return the sorted currency data dictionary for processing in the application
-    return currency_data
\ No newline at end of file
+    return currency_data
+
+
+class CurrencyCatalogue:
+    """
+    Immutable catalogue of the supported currencies, loaded once at startup.
+    Currencies are sorted by country name and indexed by currency code, and the
+    `<option>` list of a currency select is rendered once per selected currency.
+    """
+
+    def __init__(self):
+        self.currencies = ()
+        self.by_code = MappingProxyType({})
+        self._options_html = {} # Maps a selected currency code to the rendered options.
+
+    def init_app(self, app):
+        """Load the catalogue from the YAML file."""
+        self.load(app.config.get("CURRENCY_FILE", CURRENCY_FILE))
+
+    def load(self, path=CURRENCY_FILE):
+        """Replace the catalogue with the currencies listed in the YAML file."""
+        currency_data = load_currency_data(path)
+        self.currencies = tuple(
+            Currency(currency["country"], currency["currency_code"]) for currency in currency_data["currencies"]
+        )
+        self.by_code = MappingProxyType({currency.currency_code: currency for currency in self.currencies})
+        self._options_html = {}
+
+    def __contains__(self, currency_code):
+        return currency_code in self.by_code
+
+    def country(self, currency_code):
+        """Return the country of the currency code, or None if the currency is not supported."""
+        currency = self.by_code.get(currency_code)
+        return currency.country if currency else None
+
+    def options_html(self, selected=None):
+        """Return the `<option>` elements of a currency select with the given currency selected."""
+        if selected not in self.by_code:
+            selected = None # Unknown codes render like no selection, so at most one list per currency is kept
+        options = self._options_html.get(selected)
+        if options is None:
+            options = Markup("\n").join(
+                Markup('<option value="{0}"{1}>{2} ({0})</option>').format(
+                    currency.currency_code,
+                    Markup(" selected") if currency.currency_code == selected else "",
+                    currency.country,
+                )
+                for currency in self.currencies
+            )
+            self._options_html[selected] = options
+        return options
+
+    def to_json(self):
+        """Return the catalogue as a JSON serializable list."""
+        return [currency._asdict() for currency in self.currencies]
+
+
+currency_catalogue = CurrencyCatalogue()
@@ -1,19 +1,29 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from ..currency_loader import load_currency_data
-from ..utils import (
-    get_currency_conversion,
-    get_monthly_data,
-    get_category_data,
-    create_pie_chart,
-    create_bar_chart,
-)
+import calendar
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, make_response, jsonify, current_app, Response, stream_with_context
+from ..currency_loader import currency_catalogue
+from ..charts import RENDERERS_BY_EXTENSION, get_renderer
+from ..utils import get_currency_conversion, get_monthly_data, get_category_data
+from ..aggregations import get_expense_summary
+from ..chart_cache import chart_cache
+from ..chart_prerender import chart_prerenderer
+from ..pagination import get_expense_page, requested_page_size, InvalidCursor
+from ..search import parse_search_args, search_expenses
+from ..serializers import serialize_expense
+from ..rollups import delete_user_rollups
+from ..unit_of_work import after_commit
+from ..exporters import EXPORT_FORMATS, parquet_available, stream_expenses
 from ..factories.expense_factory import ExpenseFactory
-from ..models import BudgetSingleton, Expense
+from ..importers import PARSERS, detect_format, import_expenses
+from ..models import BudgetSingleton, Expense, current_month
 from ..extensions import db
 from flask_login import login_required, current_user
+from markupsafe import escape
 
 expenses_bp = Blueprint("expenses", __name__)
 
+# Shown when the add or edit form is submitted with an amount or date that cannot be read
+INVALID_EXPENSE_MESSAGE = "Invalid expense.<br>Please enter the amount as a number and the date as YYYY-MM-DD."
+
 @expenses_bp.route("/view", methods=["GET", "POST"])
 @login_required
 def view_expenses():
@@ -25,13 +35,16 @@ def view_expenses():
     if budget:
         # Ensure BudgetSingleton reflects the latest state of the budget
         budget_singleton.update(budget)
+        if db.session.is_modified(budget):
+            db.session.commit() # Persist an alert flag the update changed
 
-    # Fetch data for charts only if there are expenses
-    expenses = Expense.query.filter_by(user_id=current_user.id).all()
-    has_expenses = len(expenses) > 0
-    total = sum(expense.amount for expense in expenses)
+    # Compute the totals in the database, and show the charts only if there are expenses
+    summary = get_expense_summary(current_user.id)
+    has_expenses = summary.count > 0
+    total = summary.total
+    # Render only the first page of expenses; the rest is fetched as the user scrolls
+    expenses, next_cursor = get_expense_page(current_user.id, page_size=current_app.config.get("EXPENSES_PAGE_SIZE", 50))
 
-    currency_data = load_currency_data()
     # Default values
     conversion_rate = None
     from_currency = request.form.get("from_currency", "CAD")
@@ -41,32 +54,149 @@ def view_expenses():
     if request.method == "POST" and from_currency and to_currency:
         conversion_rate = get_currency_conversion(from_currency, to_currency)
 
-    # Generate chart images as base64 strings only if there are expenses
-    bar_chart = pie_chart = None
-    if has_expenses:
-        monthly_data = get_monthly_data(current_user.id)
-        category_data = get_category_data(current_user.id)
-        # Generate chart images as base64 strings
-        pie_chart = create_pie_chart(category_data)
-        bar_chart = create_bar_chart(*monthly_data)
-
     # Render the view expenses template with the data
     return render_template(
         "view_expenses.html",
         expenses=expenses,
+        next_cursor=next_cursor,
         total=total,
         conversion_rate=conversion_rate,
-        currency_data=currency_data,
+        currency_catalogue=currency_catalogue,
         from_currency=from_currency,
         to_currency=to_currency,
         current_spending=budget_singleton.current_total,
         budget_limit=budget_singleton.limit,
-        pie_chart=pie_chart,
-        bar_chart=bar_chart,
+        month_spending=budget_singleton.month_total,
+        projected_spending=budget_singleton.projected_total,
         has_expenses=has_expenses,
+        charts_updating=chart_prerenderer.is_pending(current_user.id),
+        chart_extension=get_renderer(current_app.config.get("CHART_RENDERER")).extension,
+    )
+
+
+@expenses_bp.route("/page")
+@login_required
+def expense_page():
+    """Route to fetch the next page of expenses for the current user. Returns a JSON response."""
+    page_size = requested_page_size()
+    try:
+        expenses, next_cursor = get_expense_page(current_user.id, request.args.get("cursor"), page_size)
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({
+        "expenses": [
+            dict(
+                serialize_expense(expense),
+                edit_url=url_for("expenses.edit_expense", expense_id=expense.id),
+                delete_url=url_for("expenses.delete_expense", expense_id=expense.id),
+            )
+            for expense in expenses
+        ],
+        "next_url": url_for("expenses.expense_page", cursor=next_cursor, limit=page_size) if next_cursor else None,
+    })
+
+
+@expenses_bp.route("/search")
+@login_required
+def search():
+    """Route to search the expenses of the current user, with facet counts per category and month. Render the search expenses template."""
+    try:
+        filters = parse_search_args(request.args)
+        result = search_expenses(
+            current_user.id, **filters,
+            cursor=request.args.get("cursor"),
+            page_size=current_app.config.get("EXPENSES_PAGE_SIZE", 50),
+        )
+    except ValueError as e: # Includes InvalidCursor, whose message quotes the submitted cursor
+        flash(escape(str(e)), "danger")
+        return redirect(url_for("expenses.search"))
+
+    def search_url(**overrides):
+        """Return the URL of the current search, from its first page, with some parameters replaced."""
+        args = {**request.args.to_dict(flat=False), **overrides}
+        args.pop("cursor", None)
+        return url_for("expenses.search", **args)
+
+    # Each facet links to the search narrowed down to it
+    category_facets = [(category, count, search_url(category=category)) for category, count in result.category_counts]
+    month_facets = []
+    for month, count in result.month_counts:
+        year, month_number = map(int, month.split("-"))
+        last_day = calendar.monthrange(year, month_number)[1]
+        month_facets.append((month, count, search_url(start=f"{month}-01", end=f"{month}-{last_day:02d}")))
+
+    return render_template(
+        "search_expenses.html",
+        result=result,
+        filters=filters,
+        category_facets=category_facets,
+        month_facets=month_facets,
+        next_url=url_for("expenses.search", **{**request.args.to_dict(flat=False), "cursor": result.next_cursor}) if result.next_cursor else None,
     )
 
 
+@expenses_bp.route("/chart/pie.<any(svg, png):extension>")
+@login_required
+def pie_chart(extension):
+    """Route to serve the category spending pie chart of the current user, as SVG or PNG."""
+    category_data = get_category_data(current_user.id)
+    renderer = RENDERERS_BY_EXTENSION[extension]
+    return chart_response("pie", renderer, renderer.pie, category_data)
+
+
+@expenses_bp.route("/chart/monthly.<any(svg, png):extension>")
+@login_required
+def monthly_chart(extension):
+    """Route to serve the monthly spending bar chart of the current user, as SVG or PNG."""
+    months, totals = get_monthly_data(current_user.id)
+    renderer = RENDERERS_BY_EXTENSION[extension]
+    return chart_response("bar", renderer, renderer.bar, months, totals)
+
+
+def chart_response(chart_type, renderer, render, *data):
+    """
+    Build a conditional image response for a chart of the current user.
+    The ETag is derived from the chart data, so unchanged charts are answered
+    with 304 Not Modified before anything is rendered.
+    """
+    if not data[0]:
+        abort(404) # No expenses to draw a chart from
+
+    chart_type = f"{chart_type}.{renderer.extension}"
+    version = chart_cache.data_version(*data)
+    etag = f"{current_user.id}-{chart_type}-{version}"
+    if etag in request.if_none_match:
+        return conditional_chart(make_response("", 304), etag)
+
+    chart = chart_cache.get(current_user.id, chart_type, version)
+    if chart is None and chart_prerenderer.is_pending(current_user.id):
+        previous = chart_cache.latest(current_user.id, chart_type)
+        if previous is not None:
+            # Serve the previous version while the new one is drawn in the background, without letting it be cached
+            response = make_response(previous.content)
+            response.mimetype = renderer.mimetype
+            response.headers["X-Chart-Updating"] = "1"
+            response.cache_control.no_store = True
+            return response
+    if chart is None:
+        chart = chart_cache.get_or_render(current_user.id, chart_type, render, *data)
+
+    response = make_response(chart.content)
+    response.mimetype = renderer.mimetype
+    response.last_modified = chart.rendered_at
+    return conditional_chart(response, etag)
+
+
+def conditional_chart(response, etag):
+    """Set the ETag and caching headers of a current chart response."""
+    response.set_etag(etag)
+    # Let the browser keep the image but revalidate it on every page view
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
 @expenses_bp.route("/delete/<int:expense_id>", methods=["POST"])
 @login_required
 def delete_expense(expense_id):
@@ -82,11 +212,12 @@ def delete_expense(expense_id):
         return redirect(url_for("expenses.view_expenses"))
 
     if current_user.budget:
-        # Use update_total to ensure database updates and observer notifications
+        # Use update_total to ensure budget updates and observer notifications
         current_user.budget.update_total(-expense.amount)
 
-    # Delete the expense
+    # Delete the expense and commit it together with the budget update
     db.session.delete(expense)
+    chart_prerenderer.schedule_after_commit(current_user.id) # Redraw the charts in the background
     db.session.commit()
 
     flash("Expense deleted successfully!", "success")
@@ -104,16 +235,22 @@ def add_expense():
 
     if request.method == "POST":
         name = request.form["name"]
-        amount = float(request.form["amount"])
         category = request.form["category"]
-        date = request.form["date"]
+        try:
+            amount = float(request.form["amount"])
+            date = ExpenseFactory.parse_date(request.form["date"])
+        except ValueError:
+            flash(INVALID_EXPENSE_MESSAGE, "danger")
+            return render_template("add_expense.html"), 400
         expense = ExpenseFactory.create_expense(name, amount, category, date, user_id=current_user.id)
         db.session.add(expense)
 
         if current_user.budget:
-            # Use update_total to ensure database updates and observer notifications
+            # Use update_total to ensure budget updates and observer notifications
             current_user.budget.update_total(amount)
 
+        # Commit the expense together with the budget update
+        chart_prerenderer.schedule_after_commit(current_user.id) # Redraw the charts in the background
         db.session.commit()
 
         flash("Expense added successfully!", "success")
@@ -123,6 +260,67 @@ def add_expense():
     return render_template("add_expense.html")
 
 
+@expenses_bp.route("/import", methods=["GET", "POST"])
+@login_required
+def import_expenses_file():
+    """Route to import expenses from a CSV or OFX file for the current user. Render the import expenses template."""
+    if current_user.username == "Guest":
+        flash("Guest users cannot import expenses.", "warning")
+        return redirect(url_for("expenses.view_expenses"))
+
+    if request.method == "POST":
+        file = request.files.get("file")
+        if not file or not file.filename:
+            flash("Please choose a file to import.", "warning")
+            return redirect(url_for("expenses.import_expenses_file"))
+        file_format = request.form.get("format") or detect_format(file.filename)
+        if file_format not in PARSERS:
+            flash("Unsupported file type.<br>Please upload a CSV or OFX file.", "danger")
+            return redirect(url_for("expenses.import_expenses_file"))
+
+        # The upload is parsed straight from its stream and inserted batch by batch
+        result = import_expenses(
+            current_user.id,
+            PARSERS[file_format](file.stream),
+            batch_size=current_app.config.get("IMPORT_BATCH_SIZE", 1000),
+        )
+
+        flash(f"Imported {result.imported} expenses in {result.elapsed:.1f}s ({result.rows_per_second:.0f} rows/s).", "success")
+        if result.skipped:
+            flash(f"Skipped {result.skipped} invalid rows.<br>" + "<br>".join(escape(error) for error in result.errors[:5]), "warning")
+        return redirect(url_for("expenses.view_expenses"))
+    # Render the import expenses template
+    return render_template("import_expenses.html")
+
+
+@expenses_bp.route("/export")
+@login_required
+def export_expenses():
+    """Route to download the expenses of the current user as CSV, JSON Lines or Parquet, streamed in chunks."""
+    file_format = request.args.get("format", "csv")
+    if file_format not in EXPORT_FORMATS:
+        flash("Unsupported export format.", "danger")
+        return redirect(url_for("expenses.view_expenses"))
+    if file_format == "parquet" and not parquet_available():
+        flash("Parquet exports are not available on this server.", "warning")
+        return redirect(url_for("expenses.view_expenses"))
+    try:
+        start = ExpenseFactory.parse_date(request.args["start"]) if request.args.get("start") else None
+        end = ExpenseFactory.parse_date(request.args["end"]) if request.args.get("end") else None
+    except ValueError:
+        flash("Invalid export date range.", "danger")
+        return redirect(url_for("expenses.view_expenses"))
+
+    rows = stream_expenses(current_user.id, start, end, request.args.getlist("category"))
+    writer, mimetype, extension = EXPORT_FORMATS[file_format]
+    # Without a Content-Length the response is sent with chunked transfer encoding as it is generated
+    return Response(
+        stream_with_context(writer(rows)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=expenses.{extension}"},
+    )
+
+
 @expenses_bp.route("/edit/<int:expense_id>", methods=["GET", "POST"])
 @login_required
 def edit_expense(expense_id):
@@ -130,21 +328,26 @@ def edit_expense(expense_id):
     expense = Expense.query.get_or_404(expense_id)
 
     if request.method == "POST":
+        try:
+            new_amount = float(request.form["amount"])
+            new_date = ExpenseFactory.parse_date(request.form["date"])
+        except ValueError:
+            flash(INVALID_EXPENSE_MESSAGE, "danger")
+            return render_template("edit_expense.html", expense=expense), 400
         old_amount = expense.amount
-        new_amount = float(request.form["amount"])
         expense.name = request.form["name"]
         expense.amount = new_amount
         expense.category = request.form["category"]
-        expense.date = request.form["date"]
-        db.session.commit()
+        expense.date = new_date
 
         # Update the budget with the difference in amount
         if current_user.budget:
             amount_difference = new_amount - old_amount
             current_user.budget.update_total(amount_difference)
 
-            # Sync the singleton with the updated budget
-            BudgetSingleton.get_instance(current_user.id).update(current_user.budget)
+        # Commit the expense together with the budget update
+        chart_prerenderer.schedule_after_commit(current_user.id) # Redraw the charts in the background
+        db.session.commit()
 
         flash("Expense updated successfully!", "success")
         # Redirect to the view expenses page after updating the expense for the user
@@ -161,17 +364,19 @@ def delete_all_expenses():
         flash('Guest users cannot delete expenses.', 'warning')
         return redirect(url_for('expenses.view_expenses'))
     if current_user.budget:
-        # Reset the current expense total in the budget
+        # Reset the current expense total and this month's spending in the budget
         current_user.budget.current_expense_total = 0
-        db.session.commit()
+        current_user.budget.month, current_user.budget.month_total = current_month(), 0
 
         # Notify observers via Singleton
         BudgetSingleton.get_instance(current_user.id).update(current_user.budget)
 
-    # Delete all expenses for the user
+    # Delete all expenses for the user along with their rollups, in the same transaction as the budget reset
     Expense.query.filter_by(user_id=current_user.id).delete()
+    delete_user_rollups(db.session.connection(), current_user.id)
+    after_commit(lambda user_id=current_user.id: chart_cache.invalidate(user_id))
     db.session.commit()
 
     flash("All expenses deleted successfully!", "success")
     # Redirect to the view expenses page after deleting all expenses for the user
-    return redirect(url_for("expenses.view_expenses"))
\ No newline at end of file
+    return redirect(url_for("expenses.view_expenses"))
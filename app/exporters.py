@@ -0,0 +1,132 @@
+import csv
+import io
+import json
+from sqlalchemy import select
+from .extensions import db
+from .models import Category, Expense
+from .multiton import ExpenseCategoryMultiton
+
+EXPORT_COLUMNS = ["id", "name", "amount", "category", "date"]
+
+
+def stream_expenses(user_id, start=None, end=None, categories=None, batch_size=1000):
+    """
+    Yield the user's expenses matching the filters, oldest first, as lightweight rows.
+    Only the exported columns are selected, and the rows are fetched `batch_size` at a
+    time through a server-side cursor where the database supports one, so memory stays
+    constant regardless of how many expenses are exported.
+    """
+    query = (
+        select(Expense.id, Expense.name, Expense.amount, Category.name.label("category"), Expense.date)
+        .join(Category, Category.id == Expense.category_id)
+        .where(Expense.user_id == user_id)
+    )
+    if start:
+        query = query.where(Expense.date >= start)
+    if end:
+        query = query.where(Expense.date <= end)
+    if categories:
+        query = query.where(Expense.category_id.in_(ExpenseCategoryMultiton.ids(categories)))
+    query = query.order_by(Expense.date, Expense.id).execution_options(stream_results=True, yield_per=batch_size)
+
+    for partition in db.session.execute(query).partitions():
+        yield from partition
+
+
+def batched(rows, batch_size):
+    """Group the rows into lists of up to `batch_size` rows."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def export_csv(rows, batch_size=1000):
+    """Yield the rows as CSV text, one chunk per batch of rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in batched(rows, batch_size):
+        writer.writerows((row.id, row.name, row.amount, row.category, row.date.isoformat()) for row in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue() # The header alone when there are no rows
+
+
+def export_ndjson(rows, batch_size=1000):
+    """Yield the rows as JSON Lines text, one chunk per batch of rows."""
+    for batch in batched(rows, batch_size):
+        yield "".join(
+            json.dumps({"id": row.id, "name": row.name, "amount": row.amount, "category": row.category, "date": row.date.isoformat()}) + "\n"
+            for row in batch
+        )
+
+
+class ChunkSink(io.RawIOBase):
+    """Write-only file collecting written bytes until they are drained, while tracking the position."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        """Return and forget everything written since the last drain."""
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def export_parquet(rows, batch_size=10000):
+    """
+    Yield the rows as a Parquet file, one row group per batch of rows.
+    Requires the optional `pyarrow` package.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("name", pa.string()),
+        ("amount", pa.float64()),
+        ("category", pa.string()),
+        ("date", pa.date32()),
+    ])
+    sink = ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for batch in batched(rows, batch_size):
+            writer.write_table(pa.Table.from_pylist([row._asdict() for row in batch], schema=schema))
+            yield sink.drain()
+    yield sink.drain() # The footer is written when the writer closes
+
+
+def parquet_available():
+    """Return whether the optional `pyarrow` package needed for Parquet exports is installed."""
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# Writer, MIME type and file extension of each export format
+EXPORT_FORMATS = {
+    "csv": (export_csv, "text/csv", "csv"),
+    "ndjson": (export_ndjson, "application/x-ndjson", "jsonl"),
+    "parquet": (export_parquet, "application/vnd.apache.parquet", "parquet"),
+}
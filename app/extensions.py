@@ -3,6 +3,11 @@ from flask_bcrypt import Bcrypt
 from flask_login import LoginManager
 from flask_mail import Mail
 from flask_migrate import Migrate
+from sqlalchemy import inspect
+import logging
+import os
+
+logger = logging.getLogger(__name__)
 
 db = SQLAlchemy()
 bcrypt = Bcrypt()
@@ -10,17 +15,41 @@ login_manager = LoginManager()
 mail = Mail()
 migrate = Migrate()  
 
+# The migration scripts, next to the app package, so they are found from any working directory
+MIGRATIONS_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+def create_schema_if_empty():
+    """
+    Create every table on an empty database and stamp it with the latest migration.
+    Existing databases are left to `flask db upgrade`: tables created here ahead of
+    the migrations that add them would make those migrations fail.
+    Return whether the schema was created.
+    """
+    from alembic.config import Config
+    from alembic.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    if inspect(db.engine).get_table_names():
+        return False
+    db.create_all()
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIRECTORY)
+    with db.engine.begin() as connection:
+        MigrationContext.configure(connection).stamp(ScriptDirectory.from_config(config), "head")
+    return True
+
 def init_db_with_retry(app, retries=3, delay=2):
     """Initialize the database with retry logic."""
     import time
     for attempt in range(retries):
         try:
             db.init_app(app)
-            migrate.init_app(app, db)  
+            migrate.init_app(app, db, directory=MIGRATIONS_DIRECTORY, render_as_batch=True)  # Batch mode lets SQLite alter columns
             with app.app_context():
-                db.create_all()
-            print("Database initialized successfully.")
+                if create_schema_if_empty():
+                    logger.info("database_schema_created")
+            logger.info("database_initialized")
             break
         except Exception as e:
-            print(f"Database initialization failed (attempt {attempt + 1}): {e}")
+            logger.warning("database_initialization_failed attempt=%s error=%s", attempt + 1, e)
             time.sleep(delay)
@@ -1,3 +1,4 @@
+from datetime import date as date_type, datetime
 from app.models import Expense
 from app.multiton import ExpenseCategoryMultiton
 
@@ -15,7 +16,7 @@ class ExpenseFactory:
         :param name: str - the expense name
         :param amount: float - the expense amount
         :param category: str - the expense category
-        :param date: str - the expense date
+        :param date: str | date - the expense date, as a date or a "YYYY-MM-DD" string
         :param user_id: int - ID of the user who created the expense
         :return: Expense instance
         """
@@ -23,7 +24,19 @@ class ExpenseFactory:
         return Expense(
             name=name,
             amount=amount,
-            category=category_instance.category,
-            date=date,
+            category_id=category_instance.id,
+            date=ExpenseFactory.parse_date(date),
             user_id=user_id,
-        )
\ No newline at end of file
+        )
+
+    @staticmethod
+    def parse_date(value):
+        """
+        Convert a "YYYY-MM-DD" string, as submitted by the date inputs, into a date.
+
+        :param value: str | date - the date to convert
+        :return: date instance
+        """
+        if isinstance(value, date_type):
+            return value
+        return datetime.strptime(value, "%Y-%m-%d").date()
\ No newline at end of file
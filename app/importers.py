@@ -0,0 +1,194 @@
+import csv
+import html
+import io
+import re
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime
+from itertools import islice
+from sqlalchemy import insert
+from .chart_prerender import chart_prerenderer
+from .extensions import db
+from .factories.expense_factory import ExpenseFactory
+from .models import Budget, Expense
+from .multiton import ExpenseCategoryMultiton
+from .rollups import apply_deltas, rollup_key
+
+# Outcome of an import, including its throughput in rows per second
+ImportResult = namedtuple("ImportResult", ["imported", "skipped", "errors", "elapsed", "rows_per_second"])
+
+MAX_REPORTED_ERRORS = 100 # Keep only the first errors, so huge broken files do not exhaust memory
+OFX_CATEGORY = "Imported" # OFX statements carry no category
+CSV_COLUMN_ALIASES = {
+    "description": "name",
+    "payee": "name",
+    "value": "amount",
+    "posted": "date",
+    "transaction date": "date",
+}
+
+
+class ImportRowError(ValueError):
+    """Raised when an imported row cannot be turned into an expense."""
+
+
+def parse_csv(stream):
+    """
+    Yield one dict per row of a CSV file with name, amount, category and date columns.
+    The file is read incrementally, so only the current row is held in memory.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    reader = csv.reader(text)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [CSV_COLUMN_ALIASES.get(name.strip().lower(), name.strip().lower()) for name in header]
+    for row in reader:
+        if any(field.strip() for field in row):
+            yield dict(zip(columns, row))
+
+
+OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+
+def parse_ofx(stream, chunk_size=64 * 1024):
+    """
+    Yield one dict per debit transaction of an OFX/QFX statement.
+    Both the SGML (OFX 1.x, unclosed tags) and XML (OFX 2.x) flavours are tokenized
+    chunk by chunk, so only the current transaction is held in memory.
+    Credits are skipped, since only money spent is an expense. A transaction cut off
+    by the end of the file is yielded as an ImportRowError, so it is reported as skipped.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8", errors="replace")
+    transaction = None
+    buffer = ""
+    while True:
+        chunk = text.read(chunk_size)
+        buffer += chunk
+        # Tokenize up to the last complete tag; the remainder may continue in the next chunk
+        end = buffer.rfind("<") if chunk else len(buffer)
+        for closing, tag, value in OFX_TAG.findall(buffer[:end]):
+            tag = tag.upper()
+            if tag == "STMTTRN":
+                if closing:
+                    if transaction is not None and transaction.get("trnamt", "").strip().startswith("-"):
+                        yield {
+                            "name": transaction.get("name") or transaction.get("memo", ""),
+                            "amount": transaction["trnamt"].strip().lstrip("-"),
+                            "category": OFX_CATEGORY,
+                            "date": transaction.get("dtposted", "")[:8],
+                        }
+                    transaction = None
+                else:
+                    transaction = {}
+            elif transaction is not None and not closing:
+                transaction[tag.lower()] = html.unescape(value.strip())
+        buffer = buffer[end:]
+        if not chunk:
+            break
+    if transaction is not None:
+        yield ImportRowError("transaction not closed before the end of the file")
+
+
+def validate_row(row):
+    """Turn a parsed row into the column values of an expense, or raise ImportRowError."""
+    name = (row.get("name") or "").strip()
+    category = (row.get("category") or "").strip()
+    if not name:
+        raise ImportRowError("missing name")
+    if not category:
+        raise ImportRowError("missing category")
+    try:
+        amount = round(float((row.get("amount") or "").replace(",", "")), 2)
+    except ValueError:
+        raise ImportRowError(f"invalid amount {row.get('amount')!r}")
+    if amount <= 0:
+        raise ImportRowError(f"amount must be positive, got {amount}")
+    value = (row.get("date") or "").strip()
+    try:
+        date = datetime.strptime(value, "%Y%m%d").date() if len(value) == 8 else ExpenseFactory.parse_date(value)
+    except ValueError:
+        raise ImportRowError(f"invalid date {value!r}")
+    return {
+        "name": name[:100],
+        "amount": amount,
+        "category_id": ExpenseCategoryMultiton(category[:50]).id,
+        "date": date,
+    }
+
+
+def import_expenses(user_id, rows, batch_size=1000):
+    """
+    Validate and insert parsed rows as expenses of the user in batches.
+    Each batch is inserted with a single executemany INSERT, its rollup deltas and
+    budget total are applied once, and it is committed on its own, so memory and
+    transaction size stay bounded however long the input is.
+    Return an ImportResult with the counts, the first errors and the throughput.
+    """
+    started = time.perf_counter()
+    imported = skipped = 0
+    errors = []
+    rows = iter(rows)
+    row_number = 0
+
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+
+        expenses = []
+        for row in chunk:
+            row_number += 1
+            try:
+                if isinstance(row, ImportRowError):
+                    raise row # A row the parser could not read
+                expenses.append(dict(validate_row(row), user_id=user_id))
+            except ImportRowError as e:
+                skipped += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(f"Row {row_number}: {e}")
+        if not expenses:
+            continue
+
+        imported += insert_expenses(user_id, expenses)
+
+    elapsed = time.perf_counter() - started
+    return ImportResult(imported, skipped, errors, elapsed, imported / elapsed if elapsed else 0)
+
+
+def insert_expenses(user_id, expenses):
+    """
+    Insert one batch of validated expense mappings of the user and commit it.
+    The bulk INSERT bypasses the ORM flush, so the rollups and the budget total are
+    updated here explicitly, once for the whole batch.
+    """
+    db.session.execute(insert(Expense), expenses)
+
+    deltas = defaultdict(lambda: [0, 0])
+    for expense in expenses:
+        key = rollup_key(user_id, expense["date"], expense["category_id"])
+        deltas[key][0] += expense["amount"]
+        deltas[key][1] += 1
+    apply_deltas(db.session.connection(), deltas)
+
+    budget = Budget.query.filter_by(user_id=user_id).first()
+    if budget:
+        budget.update_total(sum(expense["amount"] for expense in expenses))
+
+    chart_prerenderer.schedule_after_commit(user_id)
+    db.session.commit()
+    return len(expenses)
+
+
+# Parsers by import format
+PARSERS = {
+    "csv": parse_csv,
+    "ofx": parse_ofx,
+    "qfx": parse_ofx,
+}
+
+
+def detect_format(filename):
+    """Return the import format of a file from its extension, or None if it is not supported."""
+    extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    return extension if extension in PARSERS else None
@@ -0,0 +1,212 @@
+import hmac
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets, in seconds for durations
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# What each timing recorded during a request measures, as shown in the Server-Timing header
+TIMINGS = {
+    "db": "Database queries",
+    "chart": "Chart rendering",
+    "http": "External HTTP requests",
+}
+
+
+class Metrics:
+    """
+    Process-wide counters and histograms, rendered in the Prometheus text exposition format.
+    Each metric is identified by its name and a tuple of (label, value) pairs.
+    """
+
+    def __init__(self, prefix="expenseanalyzer"):
+        self.prefix = prefix
+        self._counters = {}
+        self._histograms = {} # Maps (name, labels) to [bucket counts, sum, count].
+        self._buckets = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, help_text):
+        """Set the help text of a metric."""
+        self._help[name] = help_text
+
+    def inc(self, name, labels=(), value=1):
+        """Add `value` to a counter."""
+        with self._lock:
+            self._counters[(name, labels)] = self._counters.get((name, labels), 0) + value
+
+    def observe(self, name, value, labels=(), buckets=DURATION_BUCKETS):
+        """Record a value in a histogram."""
+        with self._lock:
+            self._buckets.setdefault(name, buckets)
+            histogram = self._histograms.setdefault((name, labels), [[0] * len(buckets), 0, 0])
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def clear(self):
+        """Forget every recorded value."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(buckets), total, count)) for key, (buckets, total, count) in self._histograms.items())
+
+        described = set()
+        for (name, labels), value in counters:
+            self._header(lines, described, name, "counter")
+            lines.append(f"{self.prefix}_{name}{format_labels(labels)} {value:g}")
+        for (name, labels), (buckets, total, count) in histograms:
+            self._header(lines, described, name, "histogram")
+            for bound, bucket_count in zip(self._buckets[name], buckets):
+                lines.append(f"{self.prefix}_{name}_bucket{format_labels(labels + (('le', f'{bound:g}'),))} {bucket_count}")
+            lines.append(f"{self.prefix}_{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.prefix}_{name}_sum{format_labels(labels)} {total:g}")
+            lines.append(f"{self.prefix}_{name}_count{format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines, described, name, metric_type):
+        if name not in described:
+            described.add(name)
+            if name in self._help:
+                lines.append(f"# HELP {self.prefix}_{name} {self._help[name]}")
+            lines.append(f"# TYPE {self.prefix}_{name} {metric_type}")
+
+
+def format_labels(labels):
+    """Format (label, value) pairs as a Prometheus label set."""
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{label}="{value}"' for (label, _), value in zip(labels, escaped)) + "}"
+
+
+metrics = Metrics()
+metrics.describe("http_requests_total", "HTTP requests served, by endpoint and status.")
+metrics.describe("http_request_duration_seconds", "Time spent serving HTTP requests, by endpoint.")
+metrics.describe("request_db_queries", "Database queries issued per HTTP request, by endpoint.")
+metrics.describe("db_query_duration_seconds", "Time spent in database queries.")
+metrics.describe("chart_render_duration_seconds", "Time spent rendering charts.")
+metrics.describe("http_client_duration_seconds", "Time spent in requests to external HTTP APIs.")
+
+# Histogram of each recorded timing, outside of the per-request totals
+TIMING_METRICS = {
+    "db": "db_query_duration_seconds",
+    "chart": "chart_render_duration_seconds",
+    "http": "http_client_duration_seconds",
+}
+
+
+def record(kind, seconds):
+    """
+    Record a timing of the given kind. It is added to the totals of the current request,
+    if any, and to the process-wide histogram.
+    """
+    metrics.observe(TIMING_METRICS[kind], seconds)
+    if has_app_context() and "timings" in g:
+        total = g.timings.setdefault(kind, [0, 0.0])
+        total[0] += 1
+        total[1] += seconds
+
+
+@contextmanager
+def timed(kind):
+    """Time the block as a timing of the given kind."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(kind, time.perf_counter() - started)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    record("db", time.perf_counter() - conn.info["query_started"].pop())
+
+
+@event.listens_for(Engine, "handle_error")
+def discard_query_timer(context):
+    """A failed query never reaches after_cursor_execute, so drop its start time."""
+    if context.connection is not None and context.connection.info.get("query_started"):
+        context.connection.info["query_started"].pop()
+
+
+def start_request():
+    """Start the timings of the request."""
+    g.request_started = time.perf_counter()
+    g.timings = {}
+
+
+def finish_request(response):
+    """Add the Server-Timing header to the response, and record the request in the metrics and the log."""
+    if "timings" not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_started
+    timings = g.timings
+    endpoint = request.endpoint or "unknown"
+    queries = timings.get("db", [0, 0.0])[0]
+
+    response.headers["Server-Timing"] = ", ".join(
+        [f'{kind};dur={seconds * 1000:.1f};desc="{TIMINGS[kind]} ({count})"' for kind, (count, seconds) in timings.items()]
+        + [f"total;dur={elapsed * 1000:.1f}"]
+    )
+    metrics.inc("http_requests_total", (("endpoint", endpoint), ("method", request.method), ("status", str(response.status_code))))
+    metrics.observe("http_request_duration_seconds", elapsed, (("endpoint", endpoint),))
+    metrics.observe("request_db_queries", queries, (("endpoint", endpoint),), QUERY_COUNT_BUCKETS)
+    logger.debug(
+        "request method=%s path=%s endpoint=%s status=%s duration_ms=%.1f db_queries=%s db_ms=%.1f chart_ms=%.1f http_ms=%.1f",
+        request.method, request.path, endpoint, response.status_code, elapsed * 1000, queries,
+        timings.get("db", [0, 0.0])[1] * 1000, timings.get("chart", [0, 0.0])[1] * 1000, timings.get("http", [0, 0.0])[1] * 1000,
+    )
+    return response
+
+
+def metrics_view():
+    """Route to expose the metrics of this process to Prometheus, only to requests bearing the METRICS_TOKEN when one is set."""
+    token = current_app.config.get("METRICS_TOKEN")
+    if token and not hmac.compare_digest(request.headers.get("Authorization", "").encode(), f"Bearer {token}".encode()):
+        return "Unauthorized\n", 401, {"Content-Type": "text/plain; charset=utf-8", "WWW-Authenticate": "Bearer"}
+    return metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
+def configure_logging(app):
+    """Send the application's logs to stderr as key=value lines, at the LOG_LEVEL of the config (INFO by default)."""
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel(app.config.get("LOG_LEVEL", "INFO"))
+    if not app_logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("time=%(asctime)s level=%(levelname)s logger=%(name)s %(message)s"))
+        app_logger.addHandler(handler)
+
+
+def init_app(app):
+    """
+    Configure logging and time every request. The metrics are exposed at /metrics only if METRICS_ENABLED
+    is true, as they show how the application is used.
+    """
+    configure_logging(app)
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    if app.config.get("METRICS_ENABLED", False):
+        app.add_url_rule("/metrics", "metrics", metrics_view)
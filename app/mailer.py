@@ -0,0 +1,146 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from flask_mail import Message
+from sqlalchemy import update
+from .extensions import db, mail
+from .models import OutboxMessage
+from .unit_of_work import after_commit
+
+logger = logging.getLogger(__name__)
+
+
+def utcnow():
+    """Return the current UTC time as a naive datetime, as stored in the outbox."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def enqueue_mail(msg):
+    """
+    Add the message to the outbox instead of sending it during the request.
+    The message is stored with the current transaction, and the mail worker
+    is woken to deliver it once that transaction commits.
+    """
+    db.session.add(OutboxMessage(
+        subject=msg.subject,
+        sender=msg.sender,
+        recipients=",".join(msg.recipients),
+        body=msg.body,
+    ))
+    after_commit(mail_worker.wake)
+
+
+class MailWorker:
+    """
+    Background thread delivering the outbox over SMTP.
+    Due messages are leased before they are sent, so several worker processes
+    never send the same message twice, and each batch shares one SMTP connection.
+    Failed messages are retried with exponential backoff.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.batch_size = 50
+        self.max_attempts = 5
+        self.retry_backoff = 30 # Seconds before the first retry, doubled on every further attempt.
+        self.lease = 300 # Seconds a worker may spend sending a leased message.
+        self.poll_interval = 10
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        """Read the worker settings from the application config and start the worker."""
+        self.app = app
+        self.batch_size = app.config.get("MAIL_BATCH_SIZE", self.batch_size)
+        self.max_attempts = app.config.get("MAIL_MAX_ATTEMPTS", self.max_attempts)
+        self.retry_backoff = app.config.get("MAIL_RETRY_BACKOFF", self.retry_backoff)
+        self.poll_interval = app.config.get("MAIL_POLL_INTERVAL", self.poll_interval)
+        if app.config.get("MAIL_WORKER_ENABLED", True):
+            self.start()
+
+    def start(self):
+        """Start the worker thread unless it is already running."""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="mail-worker", daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        """Make the worker check the outbox right away instead of at the next poll."""
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            with self.app.app_context():
+                try:
+                    # Keep going while full batches indicate more mail is waiting
+                    while self.deliver_pending() == self.batch_size:
+                        pass
+                except Exception:
+                    logger.exception("mail_worker_failed")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+    def deliver_pending(self):
+        """Send one batch of due outbox messages and return how many were attempted."""
+        messages = self._lease_due_messages()
+        if not messages:
+            return 0
+
+        try:
+            with mail.connect() as connection: # One SMTP connection for the whole batch
+                for message in messages:
+                    try:
+                        connection.send(Message(
+                            message.subject,
+                            sender=message.sender,
+                            recipients=message.recipients.split(","),
+                            body=message.body,
+                        ))
+                        message.sent_at = utcnow()
+                    except Exception as e:
+                        self._schedule_retry(message, e)
+        except Exception as e:
+            # Could not connect to the SMTP server; retry whatever was not sent
+            for message in messages:
+                if message.sent_at is None:
+                    self._schedule_retry(message, e)
+        db.session.commit()
+        return len(messages)
+
+    def _lease_due_messages(self):
+        """Claim the due messages for this worker by moving their next attempt past the lease."""
+        now = utcnow()
+        due = OutboxMessage.query.filter(
+            OutboxMessage.sent_at.is_(None),
+            OutboxMessage.attempts < self.max_attempts,
+            OutboxMessage.next_attempt_at <= now,
+        ).order_by(OutboxMessage.id).limit(self.batch_size).all()
+
+        leased_ids = []
+        for message in due:
+            # Only succeeds if no other worker leased the message since it was read
+            result = db.session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id == message.id, OutboxMessage.next_attempt_at == message.next_attempt_at)
+                .values(next_attempt_at=now + timedelta(seconds=self.lease), attempts=OutboxMessage.attempts + 1)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                leased_ids.append(message.id)
+        db.session.commit()
+        return OutboxMessage.query.filter(OutboxMessage.id.in_(leased_ids)).order_by(OutboxMessage.id).all() if leased_ids else []
+
+    def _schedule_retry(self, message, error):
+        """Record the failure and schedule the next attempt with exponential backoff."""
+        message.last_error = str(error)
+        message.next_attempt_at = utcnow() + timedelta(seconds=self.retry_backoff * 2 ** (message.attempts - 1))
+        if message.attempts >= self.max_attempts:
+            logger.error("mail_given_up message_id=%s recipients=%s attempts=%s error=%s", message.id, message.recipients, message.attempts, error)
+        else:
+            logger.warning("mail_retry_scheduled message_id=%s recipients=%s attempts=%s next_attempt_at=%s error=%s", message.id, message.recipients, message.attempts, message.next_attempt_at.isoformat(), error)
+
+
+mail_worker = MailWorker()
@@ -1,13 +1,35 @@
 from .extensions import db, login_manager, mail
 from flask_login import UserMixin
-from datetime import datetime, timezone
+import calendar
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timezone
 from .observers import Subject, AlertObserver, LoggingObserver
-from sqlalchemy.orm import validates
+from .unit_of_work import after_commit
+from sqlalchemy import event, func, inspect, or_, select, update
+from sqlalchemy.orm import Session, joinedload, make_transient_to_detached, validates
+from sqlalchemy.orm.attributes import set_committed_value
+
+logger = logging.getLogger(__name__)
+
+
+def current_month():
+    """Return the current calendar month as "YYYY-MM"."""
+    return date.today().strftime("%Y-%m")
+
+
+def project_month_total(month_total, today=None):
+    """Project the spending of the current month by its last day from the average daily spend so far."""
+    today = today or date.today()
+    return month_total / today.day * calendar.monthrange(today.year, today.month)[1]
+
 
 @login_manager.user_loader  # Register the user loader function.
 def load_user(user_id):
-    """Load the user object from the database."""
-    return User.query.get(int(user_id))
+    """Load the user object, with their budget, from the per-process user cache or the database."""
+    return UserCache.load(int(user_id))
 
 class User(db.Model, UserMixin):
     """User model for storing user account information."""
@@ -27,15 +49,50 @@ class User(db.Model, UserMixin):
         # Check if the user is active and return the result.
         return self.active
 
+class Category(db.Model):
+    """Category model storing each expense category name once, referenced by expenses and rollups through its ID."""
+    __tablename__ = "categories"
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)
+
+
 class Expense(db.Model):
     """Expense model for storing user expenses."""
     __tablename__ = "expenses"
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String(100), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
-    category = db.Column(db.String(50), nullable=False)
-    date = db.Column(db.String(50), nullable=False, default=lambda: datetime.utcnow().strftime('%Y-%m-%d'))
+    # Stored as NUMERIC for exact cents, but handled as a float throughout the app.
+    amount = db.Column(db.Numeric(12, 2, asdecimal=False), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey("categories.id"), nullable=False)
+    date = db.Column(db.Date, nullable=False, default=lambda: datetime.now(timezone.utc).date())
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    # Every query filters on the user first, then ranges over dates or groups by category.
+    __table_args__ = (
+        db.Index("ix_expenses_user_id_date", "user_id", "date"),
+        db.Index("ix_expenses_user_id_category_id", "user_id", "category_id"),
+    )
+
+    @property
+    def category(self):
+        """The category name, resolved from the category ID through the category cache."""
+        from .multiton import ExpenseCategoryMultiton
+        return None if self.category_id is None else ExpenseCategoryMultiton.get(self.category_id).category
+
+    @category.setter
+    def category(self, name):
+        """Set the category by name, creating it if it does not exist yet."""
+        from .multiton import ExpenseCategoryMultiton
+        self.category_id = ExpenseCategoryMultiton(name).id
+
+
+class ExpenseRollup(db.Model):
+    """Rollup model storing spending totals per user, month and category, kept in step with the expenses."""
+    __tablename__ = "expense_rollups"
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    month = db.Column(db.String(7), primary_key=True) # Formatted as "YYYY-MM"
+    category_id = db.Column(db.Integer, db.ForeignKey("categories.id"), primary_key=True)
+    total = db.Column(db.Numeric(14, 2, asdecimal=False), nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
 
 
 class Budget(db.Model):
@@ -46,81 +103,212 @@ class Budget(db.Model):
     current_expense_total = db.Column(db.Float, default=0)
     alert_sent = db.Column(db.Boolean, default=False)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    # Spending dated in the tracked calendar month, kept in step with every expense change by the rollups
+    month = db.Column(db.String(7)) # Formatted as "YYYY-MM"
+    month_total = db.Column(db.Float, default=0)
+    projection_alert_sent = db.Column(db.Boolean, default=False)
 
     def update_total(self, amount):
-        """Update the current spending in the database and notify observers."""
-        self.current_expense_total += amount
-        db.session.commit()
-        # Update the singleton instance and notify observers after committing the changes.
+        """Update the current spending and notify observers. The change is committed with the request."""
+        # Add the amount in the database rather than to a possibly cached total, so concurrent updates are not lost
+        self.current_expense_total = Budget.current_expense_total + amount
+        db.session.flush()
+        # The flush also added the expense change to month_total in the database, so reload it with the total
+        db.session.expire(self, ["month", "month_total"])
+        # Update the singleton instance and notify observers within the same unit of work.
         BudgetSingleton.get_instance(self.user_id).update(self)
 
     def reset_alert(self):
-        """Reset the alert flag."""
+        """Reset the alert flags. The change is committed with the request."""
         self.alert_sent = False
-        db.session.commit()
-        # Reset the alert flag in the singleton instance and commit the changes.
+        self.projection_alert_sent = False
+        # Reset the alert flag in the singleton instance as well.
         BudgetSingleton.get_instance(self.user_id).reset_alert()
 
+    def roll_over(self):
+        """Start tracking the current month, counting the spending already recorded for it in the rollups."""
+        self.month = current_month()
+        self.month_total = db.session.query(func.coalesce(func.sum(ExpenseRollup.total), 0)).filter(
+            ExpenseRollup.user_id == self.user_id, ExpenseRollup.month == self.month
+        ).scalar()
+        self.projection_alert_sent = False
+
+    @staticmethod
+    def roll_over_all(month=None):
+        """
+        Start tracking the month, the current one by default, in every budget still tracking
+        another one, with a single UPDATE. Return the number of budgets rolled over.
+        """
+        month = month or current_month()
+        month_total = select(func.coalesce(func.sum(ExpenseRollup.total), 0)).where(
+            ExpenseRollup.user_id == Budget.user_id, ExpenseRollup.month == month
+        ).scalar_subquery()
+        result = db.session.execute(
+            update(Budget)
+            .where(or_(Budget.month.is_(None), Budget.month != month))
+            .values(month=month, month_total=month_total, projection_alert_sent=False)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+
+class OutboxMessage(db.Model):
+    """Outbox model storing emails until the background mail worker has delivered them."""
+    __tablename__ = "mail_outbox"
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    sender = db.Column(db.String(150), nullable=False)
+    recipients = db.Column(db.Text, nullable=False) # Comma separated email addresses
+    body = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # When the message may be (re)tried; also leased into the future while a worker is sending it.
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+    last_error = db.Column(db.Text)
+    sent_at = db.Column(db.DateTime)
+    __table_args__ = (
+        db.Index("ix_mail_outbox_pending", "sent_at", "next_attempt_at"),
+    )
+
 
 class BudgetSingleton(Subject):
-    """Singleton for managing budgets on a per-user basis."""
+    """
+    Singleton for managing budgets on a per-user basis.
+    Instances hold plain values loaded from the user's budget row, never ORM objects.
+    They are kept in a bounded LRU and reloaded from the database once older than
+    the TTL, so memory stays flat and every worker process converges on the same state.
+    """
 
-    _instances = {}
+    _instances = OrderedDict()
+    _lock = threading.Lock()
+    max_instances = 1024 # Maximum number of users whose budget state is kept in memory.
+    ttl = 60 # Seconds before a user's budget state is reloaded from the database.
+    projection_min_days = 5 # Days into the month before the spending pace is trusted for alerts.
 
-    def __init__(self, user):
+    def __init__(self, user_id):
         """
         Initialize the singleton state.
         limit: Monthly budget limit for the user.
         current_total: Current total spending for the user.
         alert_sent: Flag to indicate if an alert has been sent for exceeding the budget.
+        month_total: Spending of the user in the current month.
+        projected_total: Spending of the current month projected by its end at the current pace.
+        projection_alert_sent: Flag to indicate if an alert has been sent this month for being on pace to exceed the budget.
+        exceeded_alert_due, projection_alert_due: Alerts the last update decided to send, read by the AlertObserver.
         """
         super().__init__()
-        self.user = user
+        self.user_id = user_id
         self.limit = 0
         self.current_total = 0
         self.alert_sent = False
+        self.month_total = 0
+        self.projected_total = 0
+        self.projection_alert_sent = False
+        self.exceeded_alert_due = False
+        self.projection_alert_due = False
+        self.loaded_at = 0
         # Register the observers during initialization
         if not any(isinstance(observer, AlertObserver) for observer in self._observers):
             self.add_observer(AlertObserver())
         if not any(isinstance(observer, LoggingObserver) for observer in self._observers):
             self.add_observer(LoggingObserver())
 
+    @classmethod
+    def init_app(cls, app):
+        """Read the cache bounds from the application config."""
+        cls.max_instances = app.config.get("BUDGET_CACHE_MAX_USERS", cls.max_instances)
+        cls.ttl = app.config.get("BUDGET_CACHE_TTL", cls.ttl)
+        cls.projection_min_days = app.config.get("BUDGET_PROJECTION_MIN_DAYS", cls.projection_min_days)
+
     @classmethod # Define a class method to retrieve or create a singleton instance.
     def get_instance(cls, user_id):
-        """Retrieve or create a singleton instance for the user."""
-        if user_id not in cls._instances:
-            user = User.query.get(user_id)
-            if user:
-                cls._instances[user_id] = cls(user)
-        return cls._instances[user_id]
+        """Retrieve or create a singleton instance for the user, reloading it from the database when stale."""
+        with cls._lock:
+            instance = cls._instances.get(user_id)
+            if instance is None:
+                instance = cls._instances[user_id] = cls(user_id)
+                # Evict the least recently used users beyond the bound
+                while len(cls._instances) > cls.max_instances:
+                    cls._instances.popitem(last=False)
+            else:
+                cls._instances.move_to_end(user_id)
+        if time.monotonic() - instance.loaded_at >= cls.ttl:
+            instance.load()
+        return instance
+
+    @classmethod
+    def evict(cls, user_id):
+        """Forget the budget state of the user, so it is reloaded on next use."""
+        with cls._lock:
+            cls._instances.pop(user_id, None)
+
+    def load(self):
+        """Load the budget state of the user from the database."""
+        row = db.session.query(
+            Budget.monthly_limit, Budget.current_expense_total, Budget.alert_sent,
+            Budget.month, Budget.month_total, Budget.projection_alert_sent,
+        ).filter_by(user_id=self.user_id).first()
+        if row:
+            self.limit, self.current_total, self.alert_sent = row.monthly_limit, row.current_expense_total or 0, bool(row.alert_sent)
+            # A budget still tracking an earlier month has no spending recorded for this one yet
+            current = row.month == current_month()
+            self.month_total = (row.month_total or 0) if current else 0
+            self.projection_alert_sent = bool(row.projection_alert_sent) and current
+        else:
+            self.limit, self.current_total, self.alert_sent = 0, 0, False
+            self.month_total, self.projection_alert_sent = 0, False
+        self.projected_total = project_month_total(self.month_total)
+        self.loaded_at = time.monotonic()
 
     def update(self, budget):
-        """Update the singleton state and notify observers."""
+        """
+        Update the singleton state and notify observers.
+        Changes to the budget are left for the caller to commit once. The alert email
+        is queued in the outbox and only delivered after that commit succeeds.
+        """
+        # Start tracking the new month if it turned since the budget was last rolled over
+        if budget.month != current_month():
+            budget.roll_over()
+
         # Synchronize the singleton's state with the budget
         self.limit = budget.monthly_limit
         self.current_total = budget.current_expense_total
         self.alert_sent = budget.alert_sent
+        self.month_total = budget.month_total or 0
+        self.projected_total = project_month_total(self.month_total)
+        self.projection_alert_sent = budget.projection_alert_sent
+        self.loaded_at = time.monotonic()
 
-        # Debugging logs for state update
-        print(f"[DEBUG] Singleton Updated: Limit={self.limit}, Current Total={self.current_total}, Alert Sent={self.alert_sent}")
+        logger.debug("budget_state_synced user_id=%s limit=%s current_total=%s alert_sent=%s", self.user_id, self.limit, self.current_total, self.alert_sent)
 
         # Reset the alert if the current total is under the limit and an alert was previously sent
         if self.current_total <= self.limit and self.alert_sent:
-            print("[DEBUG] Budget is now under limit. Resetting alert flag.")
+            logger.debug("budget_alert_reset user_id=%s reason=under_limit", self.user_id)
             self.alert_sent = False
             budget.alert_sent = False
-            db.session.commit()
 
-        # Only trigger alert if the budget limit is exceeded and alert hasn't been sent
-        if self.current_total > self.limit and not self.alert_sent:
+        # Only trigger alerts if the budget limit is exceeded, or this month is on pace to exceed it,
+        # and that alert hasn't been sent. The pace alert is sent once a month, even if the pace slows down.
+        # The alert state is only changed here; observers send the alerts that are due.
+        self.exceeded_alert_due = bool(self.limit) and self.current_total > self.limit and not self.alert_sent
+        self.projection_alert_due = self.is_on_pace_to_exceed() and not self.projection_alert_sent
+        if self.exceeded_alert_due or self.projection_alert_due:
             self.notify_observers()
             # Update the alert state after notifying observers
-            self.alert_sent = True
-            budget.alert_sent = True
-            db.session.commit()
+            if self.exceeded_alert_due:
+                self.alert_sent = True
+                budget.alert_sent = True
+            if self.projection_alert_due:
+                self.projection_alert_sent = True
+                budget.projection_alert_sent = True
+
+        logger.debug("budget_state_updated user_id=%s limit=%s current_total=%s alert_sent=%s", self.user_id, self.limit, self.current_total, self.alert_sent)
 
-        # Debugging logs for state update
-        print(f"[DEBUG] Singleton Updated: Limit={self.limit}, Current Total={self.current_total}, Alert Sent={self.alert_sent}")
+    def is_on_pace_to_exceed(self):
+        """Return whether this month's spending is still within the limit but projected to exceed it by the end of the month."""
+        if not self.limit or date.today().day < self.projection_min_days:
+            return False
+        return self.month_total <= self.limit < self.projected_total
 
     def set_limit(self, limit):
         """Set the budget limit."""
@@ -131,5 +319,97 @@ class BudgetSingleton(Subject):
         self.current_total += amount
 
     def reset_alert(self):
-        """Reset the alert flag."""
-        self.alert_sent = False
\ No newline at end of file
+        """Reset the alert flags."""
+        self.alert_sent = False
+        self.projection_alert_sent = False
+        self.exceeded_alert_due = False
+        self.projection_alert_due = False
+
+
+class UserCache:
+    """
+    Short-lived per-process cache of the column values of users and their budgets.
+    Flask-Login loads the current user on every request; a cache hit rebuilds the
+    user and budget and attaches them to the session without a query. Entries are
+    dropped as soon as a user or budget is changed in this process, and expire after
+    the TTL so changes made by other worker processes are picked up quickly.
+    """
+
+    _entries = OrderedDict() # Maps user_id to (user values, budget values or None, loaded_at).
+    _lock = threading.Lock()
+    max_users = 1024 # Maximum number of users kept in the cache.
+    ttl = 30 # Seconds before a cached user is loaded from the database again.
+
+    @classmethod
+    def init_app(cls, app):
+        """Read the cache bounds from the application config."""
+        cls.max_users = app.config.get("USER_CACHE_MAX_USERS", cls.max_users)
+        cls.ttl = app.config.get("USER_CACHE_TTL", cls.ttl)
+
+    @classmethod
+    def load(cls, user_id):
+        """Return the user, with their budget loaded, attached to the current session. Return None if there is no such user."""
+        with cls._lock:
+            entry = cls._entries.get(user_id)
+            if entry is not None and time.monotonic() - entry[2] < cls.ttl:
+                cls._entries.move_to_end(user_id)
+            else:
+                entry = None
+        if entry is not None:
+            return cls._attach(*entry[:2])
+
+        # Load the budget in the same query, as nearly every page reads it
+        user = db.session.get(User, user_id, options=[joinedload(User.budget)])
+        if user is not None and not db.session.is_modified(user):
+            entry = (cls._values(user), cls._values(user.budget) if user.budget else None, time.monotonic())
+            with cls._lock:
+                cls._entries[user_id] = entry
+                cls._entries.move_to_end(user_id)
+                # Evict the least recently used users beyond the bound
+                while len(cls._entries) > cls.max_users:
+                    cls._entries.popitem(last=False)
+        return user
+
+    @classmethod
+    def evict(cls, user_id):
+        """Forget the cached user, so they are loaded from the database on next use."""
+        with cls._lock:
+            cls._entries.pop(user_id, None)
+
+    @classmethod
+    def clear(cls):
+        """Forget every cached user."""
+        with cls._lock:
+            cls._entries.clear()
+
+    @staticmethod
+    def _values(instance):
+        """Return the column values of a model instance."""
+        return {attribute.key: getattr(instance, attribute.key) for attribute in inspect(type(instance)).column_attrs}
+
+    @staticmethod
+    def _attach(user_values, budget_values):
+        """Rebuild a user and budget from their cached values and merge them into the session without loading them."""
+        user = User(**user_values)
+        make_transient_to_detached(user)
+        budget = None
+        if budget_values is not None:
+            budget = Budget(**budget_values)
+            make_transient_to_detached(budget)
+            set_committed_value(budget, "user", user)
+        set_committed_value(user, "budget", budget)
+        return db.session.merge(user, load=False)
+
+
+@event.listens_for(Session, "after_flush")
+def evict_changed_users(session, flush_context):
+    """Drop the cached users whose user or budget row was just written, and again once the change is committed."""
+    user_ids = {
+        instance.id if isinstance(instance, User) else instance.user_id
+        for instance in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(instance, (User, Budget))
+    }
+    for user_id in user_ids:
+        UserCache.evict(user_id)
+        # A concurrent request may cache the old values before this transaction commits
+        after_commit(lambda user_id=user_id: UserCache.evict(user_id), session)
@@ -1,16 +1,187 @@
+import logging
+import threading
+from collections import OrderedDict
+from sqlalchemy import event, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from .extensions import db
+from .models import Category, ExpenseRollup
+from .unit_of_work import after_commit
+
+logger = logging.getLogger(__name__)
+
+# INSERT constructs supporting ON CONFLICT DO NOTHING, by dialect
+DIALECT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
 class ExpenseCategoryMultiton:
     """
-    Multiton class to create only one instance of a class per category name.
+    Multiton class to create only one instance per category name, holding the ID of its row in the categories table.
+    Instances are kept in a bounded LRU, warmed with the most used categories on startup,
+    so resolving a name to its ID, or an ID to its name, rarely needs a query and
+    memory stays flat however many distinct categories users type. Categories are
+    never renamed, so cached instances never go stale.
     """
-    _instances = {}
+    _instances = OrderedDict() # Maps category names to instances.
+    _ids = {} # Maps category IDs to the same instances.
+    _lock = threading.Lock()
+    max_instances = 1024 # Maximum number of categories kept in memory.
 
     def __new__(cls, category):
-        """ Create a new instance of the class if it doesn't exist for the given category."""
-        if category not in cls._instances: # Check if an instance already exists for the category.
-            cls._instances[category] = super().__new__(cls) # Create a new instance if not found for the category name.
-            cls._instances[category].category = category # Set the category name for the instance.
-        return cls._instances[category] # Return the instance for the category name.
+        """Return the instance of the category name, creating the category in the database if it doesn't exist yet."""
+        instance = cls._cached(category)
+        if instance is None:
+            # Categories created by the current transaction are only cached once it commits
+            instance = db.session.info.get("new_categories", {}).get(category)
+        if instance is None:
+            category_id = db.session.query(Category.id).filter_by(name=category).scalar()
+            instance = cls._create(category) if category_id is None else cls._remember(category_id, category)
+        return instance
 
     def __init__(self, category):
         """ Initialize the category attribute for the instance."""
         self.category = category # Set the category attribute for the instance.
+
+    @classmethod
+    def init_app(cls, app):
+        """Read the cache bound from the application config and warm the cache with the most used categories."""
+        cls.max_instances = app.config.get("CATEGORY_CACHE_MAX_CATEGORIES", cls.max_instances)
+        cls.clear()
+        with app.app_context():
+            try:
+                cls.warm()
+            except SQLAlchemyError as e:
+                logger.warning("category_cache_warm_failed error=%s", e)
+            finally:
+                db.session.remove()
+
+    @classmethod
+    def warm(cls):
+        """Load the categories with the most expenses into the cache, up to its bound. Return how many were loaded."""
+        uses = select(ExpenseRollup.category_id, func.sum(ExpenseRollup.count).label("uses")).group_by(ExpenseRollup.category_id).subquery()
+        rows = db.session.execute(
+            select(Category.id, Category.name)
+            .outerjoin(uses, uses.c.category_id == Category.id)
+            .order_by(func.coalesce(uses.c.uses, 0).desc(), Category.id)
+            .limit(cls.max_instances)
+        ).all()
+        # Remember the least used first, so the most used end up last in the LRU order
+        for category_id, name in reversed(rows):
+            cls._remember(category_id, name)
+        logger.info("category_cache_warmed categories=%s", len(rows))
+        return len(rows)
+
+    @classmethod
+    def get(cls, category_id):
+        """Return the instance of the category with the given ID."""
+        with cls._lock:
+            instance = cls._ids.get(category_id)
+            if instance is not None:
+                cls._instances.move_to_end(instance.category)
+                return instance
+        for instance in db.session.info.get("new_categories", {}).values():
+            if instance.id == category_id:
+                return instance
+        return cls._remember(category_id, db.session.query(Category.name).filter_by(id=category_id).scalar())
+
+    @classmethod
+    def names(cls, category_ids):
+        """Return a dict mapping each of the category IDs to its name, loading the uncached ones in a single query."""
+        names = {}
+        missing = set()
+        with cls._lock:
+            for category_id in set(category_ids):
+                instance = cls._ids.get(category_id)
+                if instance is None:
+                    missing.add(category_id)
+                else:
+                    names[category_id] = instance.category
+        if missing:
+            for category_id, name in db.session.query(Category.id, Category.name).filter(Category.id.in_(missing)):
+                names[category_id] = cls._remember(category_id, name).category
+        return names
+
+    @classmethod
+    def ids(cls, categories):
+        """Return the IDs of the existing categories among the names, without creating the missing ones."""
+        ids = []
+        missing = set()
+        for category in set(categories):
+            instance = cls._cached(category)
+            if instance is None:
+                missing.add(category)
+            else:
+                ids.append(instance.id)
+        if missing:
+            for category_id, name in db.session.query(Category.id, Category.name).filter(Category.name.in_(missing)):
+                ids.append(cls._remember(category_id, name).id)
+        return ids
+
+    @classmethod
+    def clear(cls):
+        """Forget every cached category."""
+        with cls._lock:
+            cls._instances.clear()
+            cls._ids.clear()
+
+    @classmethod
+    def _cached(cls, category):
+        """Return the cached instance of the category name, or None."""
+        with cls._lock:
+            instance = cls._instances.get(category)
+            if instance is not None:
+                cls._instances.move_to_end(category)
+            return instance
+
+    @classmethod
+    def _build(cls, category_id, category):
+        """Build an instance without going through the database lookup of `__new__`."""
+        instance = super().__new__(cls)
+        instance.id = category_id
+        instance.category = category
+        return instance
+
+    @classmethod
+    def _remember(cls, category_id, category, instance=None):
+        """Cache the instance of a committed category, evicting the least recently used ones beyond the bound. Return it."""
+        with cls._lock:
+            cached = cls._instances.get(category)
+            if cached is not None:
+                cls._instances.move_to_end(category)
+                return cached
+            instance = instance or cls._build(category_id, category)
+            cls._instances[category] = instance
+            cls._ids[category_id] = instance
+            while len(cls._instances) > cls.max_instances:
+                _, evicted = cls._instances.popitem(last=False)
+                cls._ids.pop(evicted.id, None)
+            return instance
+
+    @classmethod
+    def _create(cls, category):
+        """Insert the category with the current transaction and return its instance, cached once the transaction commits."""
+        dialect_insert = DIALECT_INSERTS.get(db.session.get_bind().dialect.name)
+        if dialect_insert is None:
+            result = db.session.execute(insert(Category).values(name=category))
+        else:
+            # A concurrent request may insert the same name first, in which case its row is used
+            result = db.session.execute(dialect_insert(Category).values(name=category).on_conflict_do_nothing(index_elements=["name"]))
+        category_id = db.session.query(Category.id).filter_by(name=category).scalar()
+        if result.rowcount == 0:
+            return cls._remember(category_id, category)
+        instance = cls._build(category_id, category)
+        db.session.info.setdefault("new_categories", {})[category] = instance
+        after_commit(lambda: cls._remember(category_id, category, instance))
+        return instance
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def forget_new_categories(session):
+    """Once the transaction ends, its new categories are either committed and cached, or gone."""
+    if not session.in_nested_transaction():
+        session.info.pop("new_categories", None)
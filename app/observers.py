@@ -1,3 +1,7 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
 class Observer:
     """Base Observer interface."""
     def update(self, subject):
@@ -22,40 +26,54 @@ class Subject:
             observer.update(self)
 
 class AlertObserver(Observer):
-    """Observer for sending budget alerts."""
+    """Observer for sending the budget alerts the subject decided are due. The subject keeps track of the alerts sent."""
     def update(self, subject):
-        print(f"[DEBUG] Observer Notified: Limit={subject.limit}, Current Total={subject.current_total}, Alert Sent={subject.alert_sent}")
-
-        # Skip alert if no budget limit or already sent
-        if subject.limit == 0 or subject.alert_sent:
-            return
+        logger.debug("alert_observer_notified user_id=%s limit=%s current_total=%s alert_sent=%s", subject.user_id, subject.limit, subject.current_total, subject.alert_sent)
 
-        if subject.current_total > subject.limit and not subject.alert_sent:
+        if subject.exceeded_alert_due:
             excess_amount = subject.current_total - subject.limit
-            self.send_alert(excess_amount)
-            subject.alert_sent = True
+            self.send_alert(subject.user_id, excess_amount)
 
-    def send_alert(self, excess_amount):
-        """Send an alert email."""
+        if subject.projection_alert_due:
+            self.send_projection_alert(subject.user_id, subject.month_total, subject.projected_total, subject.limit)
+
+    def send_alert(self, user_id, excess_amount):
+        """Queue an alert email to the budget's user, who need not be the logged in user (e.g. CLI imports)."""
+        self.queue_email(
+            user_id,
+            "Budget Exceeded Alert!",
+            f"You have exceeded your budget by ${excess_amount:.2f}.",
+        )
+
+    def send_projection_alert(self, user_id, month_total, projected_total, limit):
+        """Queue an early warning email that this month's spending is on pace to exceed the budget."""
+        self.queue_email(
+            user_id,
+            "Budget Pace Alert",
+            f"You have spent ${month_total:.2f} so far this month. At this pace you will spend about "
+            f"${projected_total:.2f} by the end of the month, ${projected_total - limit:.2f} over your budget of ${limit:.2f}.",
+        )
+
+    def queue_email(self, user_id, subject, text):
+        """Queue an email to the user, delivered by the mail worker once the budget update is committed."""
         from flask_mail import Message
-        from flask_login import current_user
-        from app.extensions import mail
+        from app.extensions import db
+        from app.mailer import enqueue_mail
+        from app.models import User
 
+        user = db.session.get(User, user_id)
         msg = Message(
-            "Budget Exceeded Alert!",
+            subject,
             sender="YousifZito4SA3@gmail.com",
-            recipients=[current_user.email],
-        )
-        msg.body = (
-            f"Hello {current_user.username},\n\n"
-            f"You have exceeded your budget by ${excess_amount:.2f}.\n\nThank you!"
+            recipients=[user.email],
         )
-        mail.send(msg)
+        msg.body = f"Hello {user.username},\n\n{text}\n\nThank you!"
+        enqueue_mail(msg)
 
 class LoggingObserver(Observer):
     """Observer for logging budget changes."""
     def update(self, subject):
         if subject.limit == 0:
-            print("[LOG] Budget deleted: Limit=0, Current Total=0")
+            logger.info("budget_deleted user_id=%s", subject.user_id)
         else:
-            print(f"[LOG] Budget updated: Limit={subject.limit}, Current Total={subject.current_total}")
+            logger.info("budget_updated user_id=%s limit=%s current_total=%s", subject.user_id, subject.limit, subject.current_total)
@@ -0,0 +1,54 @@
+from datetime import date
+from flask import current_app, request
+from sqlalchemy import and_, or_
+from .models import Expense
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(expense):
+    """Encode the position of an expense in the listing as an opaque cursor."""
+    return f"{expense.date.isoformat()}~{expense.id}"
+
+
+def decode_cursor(cursor):
+    """Decode a cursor into the (date, id) pair of the last expense on the previous page."""
+    try:
+        expense_date, expense_id = cursor.rsplit("~", 1)
+        return date.fromisoformat(expense_date), int(expense_id)
+    except (AttributeError, ValueError):
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+
+
+def after_cursor(cursor):
+    """Return the condition selecting the expenses listed after the (date, id) position encoded in `cursor`."""
+    expense_date, expense_id = decode_cursor(cursor)
+    return or_(
+        Expense.date < expense_date,
+        and_(Expense.date == expense_date, Expense.id < expense_id),
+    )
+
+
+def requested_page_size():
+    """Return the page size requested with the `limit` parameter, EXPENSES_PAGE_SIZE by default, clamped to 1..EXPENSES_MAX_PAGE_SIZE."""
+    page_size = request.args.get("limit", current_app.config.get("EXPENSES_PAGE_SIZE", 50), type=int)
+    return max(1, min(page_size, current_app.config.get("EXPENSES_MAX_PAGE_SIZE", 500)))
+
+
+def get_expense_page(user_id, cursor=None, page_size=50):
+    """
+    Retrieve one page of the user's expenses, newest first, using keyset pagination.
+    Instead of an OFFSET, the page starts right after the (date, id) position encoded
+    in `cursor`, so every page costs the same no matter how deep the user scrolls.
+    Return the expenses on the page and the cursor of the next page, or None on the last page.
+    """
+    query = Expense.query.filter(Expense.user_id == user_id)
+    if cursor:
+        query = query.filter(after_cursor(cursor))
+    # Fetch one extra row to find out whether there is a next page
+    expenses = query.order_by(Expense.date.desc(), Expense.id.desc()).limit(page_size + 1).all()
+
+    next_cursor = encode_cursor(expenses[page_size - 1]) if len(expenses) > page_size else None
+    return expenses[:page_size], next_cursor
@@ -0,0 +1,104 @@
+import logging
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from .instrumentation import timed
+
+logger = logging.getLogger(__name__)
+
+
+class ExchangeRateProvider:
+    """
+    Client for the ExchangeRate API that caches whole conversion tables per base currency.
+    A single `/latest/{BASE}` response holds the rates to every other currency, so one
+    fetched table answers every conversion from that base, and any conversion between
+    two currencies it lists, until the table is older than the TTL.
+    """
+
+    def __init__(self, api_url="https://v6.exchangerate-api.com/v6", api_key=None, ttl=3600, timeout=5):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.ttl = ttl
+        self.timeout = timeout
+        self._tables = {} # Maps a base currency to its (conversion rates, fetched at) pair.
+        self._fetch_locks = {} # One lock per base currency, so concurrent misses share one request.
+        self._lock = threading.Lock()
+        self._session = self._create_session()
+
+    def init_app(self, app):
+        """Read the API settings from the application config."""
+        self.api_url = app.config.get("EXCHANGE_RATE_API_URL", self.api_url).rstrip("/")
+        self.api_key = app.config.get("API_KEY", self.api_key)
+        self.ttl = app.config.get("EXCHANGE_RATE_TTL", self.ttl)
+        self.timeout = app.config.get("EXCHANGE_RATE_TIMEOUT", self.timeout)
+
+    @staticmethod
+    def _create_session():
+        """Create an HTTP session that keeps its connections to the API alive between requests."""
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=10, max_retries=1))
+        session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=10, max_retries=1))
+        return session
+
+    def get_rate(self, from_currency, to_currency):
+        """Return the conversion rate from `from_currency` to `to_currency`, or None if either is unknown."""
+        from_currency, to_currency = from_currency.upper(), to_currency.upper()
+        if from_currency == to_currency:
+            return 1.0
+
+        # Derive the rate from any fresh table listing both currencies before fetching the base
+        for base, (rates, fetched_at) in list(self._tables.items()):
+            if self._is_fresh(fetched_at) and from_currency in rates and to_currency in rates:
+                return float(rates[to_currency]) / float(rates[from_currency])
+
+        rates = self.get_rates(from_currency)
+        rate = rates.get(to_currency)
+        return float(rate) if rate is not None else None
+
+    def get_rates(self, base):
+        """
+        Return the conversion table of the base currency, fetching it when the cached one expired.
+        If the API cannot be reached, an expired table is served rather than failing the request.
+        """
+        base = base.upper()
+        table = self._tables.get(base)
+        if table and self._is_fresh(table[1]):
+            return table[0]
+
+        with self._lock:
+            fetch_lock = self._fetch_locks.setdefault(base, threading.Lock())
+        with fetch_lock:
+            # Another request may have fetched the table while this one was waiting
+            table = self._tables.get(base)
+            if table and self._is_fresh(table[1]):
+                return table[0]
+            try:
+                rates = self._fetch_rates(base)
+            except (requests.RequestException, ValueError) as e:
+                if table is None:
+                    raise
+                logger.warning("Serving stale %s exchange rates, the API request failed: %s", base, e)
+                return table[0]
+            self._tables[base] = (rates, time.monotonic())
+            return rates
+
+    def clear(self):
+        """Forget every cached conversion table."""
+        self._tables.clear()
+
+    def _is_fresh(self, fetched_at):
+        return time.monotonic() - fetched_at < self.ttl
+
+    def _fetch_rates(self, base):
+        """Fetch the conversion table of the base currency from the API."""
+        with timed("http"):
+            response = self._session.get(f"{self.api_url}/{self.api_key}/latest/{base}", timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        if data.get("result") == "error":
+            raise ValueError(f"Exchange rate API error: {data.get('error-type')}")
+        return data.get("conversion_rates", {})
+
+
+rate_provider = ExchangeRateProvider()
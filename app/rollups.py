@@ -0,0 +1,140 @@
+from collections import defaultdict
+from sqlalchemy import and_, delete, event, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from .models import Budget, Expense, ExpenseRollup, current_month
+from .aggregations import expense_month
+
+
+def rollup_key(user_id, date, category_id):
+    """Return the (user_id, month, category_id) key of the rollup row an expense belongs to."""
+    return user_id, date.strftime("%Y-%m"), category_id
+
+
+def apply_deltas(connection, deltas):
+    """
+    Add the spending deltas to the rollup rows, creating and removing rows as needed,
+    and to the month totals of the budgets.
+    `deltas` maps (user_id, month, category_id) keys to [total, count] changes.
+    The rows are updated in place with `total = total + delta`, so concurrent writers never overwrite each other.
+    """
+    table = ExpenseRollup.__table__
+    for (user_id, month, category_id), (total, count) in deltas.items():
+        if not total and not count:
+            continue
+        key = and_(table.c.user_id == user_id, table.c.month == month, table.c.category_id == category_id)
+        add = update(table).where(key).values(total=table.c.total + total, count=table.c.count + count)
+        result = connection.execute(add)
+        if result.rowcount == 0:
+            try:
+                # In a savepoint, so losing a race with a concurrent insert of the row leaves the transaction usable
+                with connection.begin_nested():
+                    connection.execute(
+                        insert(table).values(user_id=user_id, month=month, category_id=category_id, total=total, count=count)
+                    )
+            except IntegrityError:
+                # Another request created the row first, so add to it instead
+                connection.execute(add)
+        elif count < 0:
+            # Drop the row once its last expense is gone
+            connection.execute(delete(table).where(key, table.c.count <= 0))
+    apply_budget_month_deltas(connection, deltas)
+
+
+def apply_budget_month_deltas(connection, deltas):
+    """
+    Add the spending deltas of the current month to the month total of the users' budgets.
+    Budgets still tracking an earlier month are left alone, as rolling them over recounts the new month.
+    """
+    table = Budget.__table__
+    month = current_month()
+    month_deltas = defaultdict(float)
+    for (user_id, delta_month, _), (total, _) in deltas.items():
+        if delta_month == month:
+            month_deltas[user_id] += total
+    for user_id, total in month_deltas.items():
+        if total:
+            connection.execute(
+                update(table)
+                .where(table.c.user_id == user_id, table.c.month == month)
+                .values(month_total=table.c.month_total + total)
+            )
+
+
+def delete_user_rollups(connection, user_id):
+    """Remove every rollup row of the user, e.g. after all their expenses were deleted."""
+    table = ExpenseRollup.__table__
+    connection.execute(delete(table).where(table.c.user_id == user_id))
+
+
+def compute_rollups(connection, user_id=None):
+    """Recompute the rollup rows from the expenses table, for one user or for everyone."""
+    month = expense_month(Expense.date)
+    query = select(
+        Expense.user_id, month.label("month"), Expense.category_id,
+        func.sum(Expense.amount).label("total"), func.count(Expense.id).label("count"),
+    ).group_by(Expense.user_id, month, Expense.category_id)
+    if user_id is not None:
+        query = query.where(Expense.user_id == user_id)
+    return {(row.user_id, row.month, row.category_id): (row.total, row.count) for row in connection.execute(query)}
+
+
+def rebuild_rollups(connection, user_id=None):
+    """Replace the rollup rows with ones recomputed from the expenses table."""
+    table = ExpenseRollup.__table__
+    rollups = compute_rollups(connection, user_id)
+    if user_id is None:
+        connection.execute(delete(table))
+    else:
+        delete_user_rollups(connection, user_id)
+    if rollups:
+        connection.execute(insert(table), [
+            {"user_id": key[0], "month": key[1], "category_id": key[2], "total": total, "count": count}
+            for key, (total, count) in rollups.items()
+        ])
+    return len(rollups)
+
+
+def find_rollup_mismatches(connection, user_id=None):
+    """Compare the stored rollup rows with recomputed ones and return the keys that differ."""
+    query = select(ExpenseRollup.user_id, ExpenseRollup.month, ExpenseRollup.category_id, ExpenseRollup.total, ExpenseRollup.count)
+    if user_id is not None:
+        query = query.where(ExpenseRollup.user_id == user_id)
+    stored = {(row.user_id, row.month, row.category_id): (row.total, row.count) for row in connection.execute(query)}
+    expected = compute_rollups(connection, user_id)
+    return sorted(
+        key for key in stored.keys() | expected.keys()
+        if key not in stored or key not in expected
+        or stored[key][1] != expected[key][1] or round(stored[key][0] - expected[key][0], 2) != 0
+    )
+
+
+def _previous_value(expense, attribute):
+    """Return the value an attribute of the expense had before the pending changes."""
+    history = get_history(expense, attribute)
+    return history.deleted[0] if history.deleted else getattr(expense, attribute)
+
+
+@event.listens_for(Session, "after_flush")
+def update_rollups(session, flush_context):
+    """Apply the spending changes of every flushed expense to the rollups within the same transaction."""
+    deltas = defaultdict(lambda: [0, 0])
+    for expense in session.new:
+        if isinstance(expense, Expense):
+            key = rollup_key(expense.user_id, expense.date, expense.category_id)
+            deltas[key][0] += expense.amount
+            deltas[key][1] += 1
+    for expense in session.dirty | session.deleted:
+        if not isinstance(expense, Expense) or (expense in session.dirty and not session.is_modified(expense)):
+            continue
+        previous = [_previous_value(expense, attribute) for attribute in ("user_id", "date", "category_id", "amount")]
+        key = rollup_key(*previous[:3])
+        deltas[key][0] -= previous[3]
+        deltas[key][1] -= 1
+        if expense not in session.deleted:
+            key = rollup_key(expense.user_id, expense.date, expense.category_id)
+            deltas[key][0] += expense.amount
+            deltas[key][1] += 1
+    if deltas:
+        apply_deltas(session.connection(), deltas)
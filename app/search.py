@@ -0,0 +1,182 @@
+"""
+Full-text and faceted expense search.
+
+Expense names and categories are indexed by the database itself, so the index
+stays in sync with every write path, including bulk imports and deletes:
+
+- SQLite: a contentless FTS5 table maintained by triggers on the expenses table,
+  which look up the category name of each expense. Each entry also holds a
+  "u<user_id>" owner token, so a search only walks the postings of the searching user.
+- PostgreSQL: a GIN index over the tsvector of the name. Category names live in
+  the small categories table, so matching ones are found there and expenses
+  filtered on their category ID.
+- Other databases fall back to LIKE over the user's expenses.
+
+Search words match the start of words in the name or category, e.g. "gro"
+finds "Groceries".
+"""
+import re
+import weakref
+from collections import Counter, namedtuple
+from sqlalchemy import DDL, and_, event, func, inspect, literal_column, or_, select, text
+from .aggregations import expense_month
+from .extensions import db
+from .factories.expense_factory import ExpenseFactory
+from .models import Category, Expense, ExpenseRollup
+from .multiton import ExpenseCategoryMultiton
+from .pagination import after_cursor, encode_cursor
+
+SEARCH_TABLE = "expenses_fts"
+
+# Category names never change, so the name an entry was indexed with is still the one to delete it with
+OLD_CATEGORY = "(SELECT name FROM categories WHERE id = old.category_id)"
+NEW_CATEGORY = "(SELECT name FROM categories WHERE id = new.category_id)"
+
+SQLITE_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "name, category, owner, content='', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert AFTER INSERT ON expenses BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, name, category, owner) VALUES (new.id, new.name, {NEW_CATEGORY}, 'u' || new.user_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete AFTER DELETE ON expenses BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, name, category, owner) VALUES ('delete', old.id, old.name, {OLD_CATEGORY}, 'u' || old.user_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update AFTER UPDATE OF name, category_id, user_id ON expenses BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, name, category, owner) VALUES ('delete', old.id, old.name, {OLD_CATEGORY}, 'u' || old.user_id);
+        INSERT INTO {SEARCH_TABLE}(rowid, name, category, owner) VALUES (new.id, new.name, {NEW_CATEGORY}, 'u' || new.user_id);
+    END""",
+)
+
+POSTGRESQL_DDL = (
+    "CREATE INDEX IF NOT EXISTS ix_expenses_search ON expenses USING gin (to_tsvector('simple', name))",
+)
+
+# Create the index together with the expenses table on new databases; existing ones get it from the migration
+for statement in SQLITE_DDL:
+    event.listen(Expense.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+for statement in POSTGRESQL_DDL:
+    event.listen(Expense.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
+# Search words are runs of letters and digits; everything else only separates them
+WORD = re.compile(r"[^\W_]+")
+
+# Expenses on one page of search results, the cursor of the next page, and the facet counts of every match
+SearchResult = namedtuple("SearchResult", ["expenses", "next_cursor", "total", "category_counts", "month_counts"])
+
+_backends = weakref.WeakKeyDictionary() # Maps an engine to its search backend.
+
+
+def search_backend():
+    """Return how the current database is searched: "fts5", "tsvector" or "like"."""
+    engine = db.engine
+    backend = _backends.get(engine)
+    if backend is None:
+        if engine.dialect.name == "sqlite":
+            backend = "fts5" if inspect(engine).has_table(SEARCH_TABLE) else "like"
+        elif engine.dialect.name == "postgresql":
+            backend = "tsvector"
+        else:
+            backend = "like"
+        _backends[engine] = backend
+    return backend
+
+
+def text_condition(user_id, words):
+    """Return the condition on expenses matching every word, as the start of a word in their name or category."""
+    backend = search_backend()
+    if backend == "fts5":
+        terms = " AND ".join(f'"{word}"*' for word in words)
+        matches = select(text("rowid")).select_from(text(SEARCH_TABLE)).where(
+            text(f"{SEARCH_TABLE} MATCH :query").bindparams(query=f'owner : "u{user_id}" AND {{name category}} : ({terms})')
+        )
+        return Expense.id.in_(matches)
+    if backend == "tsvector":
+        # Spelled exactly like the indexed expression, with literals rather than bound parameters, so the index is used
+        simple = literal_column("'simple'")
+        conditions = []
+        for word in words:
+            query = func.to_tsquery(simple, f"{word}:*")
+            matching_categories = select(Category.id).where(func.to_tsvector(simple, Category.name).op("@@")(query))
+            conditions.append(or_(func.to_tsvector(simple, Expense.name).op("@@")(query), Expense.category_id.in_(matching_categories)))
+        return and_(*conditions)
+    return and_(*(
+        or_(
+            Expense.name.ilike(f"{word}%"),
+            Expense.name.ilike(f"% {word}%"),
+            Expense.category_id.in_(select(Category.id).where(Category.name.ilike(f"{word}%"))),
+        )
+        for word in words
+    ))
+
+
+def parse_search_args(args):
+    """
+    Read the search parameters of a request: `q`, `start` and `end` dates, `min_amount`,
+    `max_amount` and repeated `category`. Return them as keyword arguments of
+    `search_expenses`, or raise ValueError if one is malformed.
+    """
+    filters = {"query": args.get("q", "").strip(), "categories": args.getlist("category")}
+    for name in ("start", "end"):
+        try:
+            filters[name] = ExpenseFactory.parse_date(args[name]) if args.get(name) else None
+        except ValueError:
+            raise ValueError(f"Invalid {name} date, expected YYYY-MM-DD.")
+    for name in ("min_amount", "max_amount"):
+        try:
+            filters[name] = float(args[name]) if args.get(name) else None
+        except ValueError:
+            raise ValueError(f"Invalid {name.replace('_', ' ')}.")
+    return filters
+
+
+def search_expenses(user_id, query=None, start=None, end=None, min_amount=None, max_amount=None, categories=None, cursor=None, page_size=50):
+    """
+    Search the user's expenses by words in their name or category, within optional date
+    and amount ranges and categories. Return one page of matches, newest first with
+    keyset pagination like the expense listing, and the number of matches per category
+    and per month.
+    """
+    words = [word.lower() for word in WORD.findall(query or "")]
+    conditions = [Expense.user_id == user_id]
+    if words:
+        conditions.append(text_condition(user_id, words))
+    if start:
+        conditions.append(Expense.date >= start)
+    if end:
+        conditions.append(Expense.date <= end)
+    if min_amount is not None:
+        conditions.append(Expense.amount >= min_amount)
+    if max_amount is not None:
+        conditions.append(Expense.amount <= max_amount)
+    if categories:
+        category_ids = ExpenseCategoryMultiton.ids(categories)
+        conditions.append(Expense.category_id.in_(category_ids))
+
+    page_query = Expense.query.filter(*conditions)
+    if cursor:
+        page_query = page_query.filter(after_cursor(cursor))
+    # Fetch one extra row to find out whether there is a next page
+    expenses = page_query.order_by(Expense.date.desc(), Expense.id.desc()).limit(page_size + 1).all()
+    next_cursor = encode_cursor(expenses[page_size - 1]) if len(expenses) > page_size else None
+
+    if words or start or end or min_amount is not None or max_amount is not None:
+        month = expense_month(Expense.date)
+        facets = select(Expense.category_id, month, func.count()).where(*conditions).group_by(Expense.category_id, month)
+    else:
+        # Without text, date or amount filters, the rollups already hold the counts
+        facets = select(ExpenseRollup.category_id, ExpenseRollup.month, ExpenseRollup.count).where(ExpenseRollup.user_id == user_id)
+        if categories:
+            facets = facets.where(ExpenseRollup.category_id.in_(category_ids))
+    category_counts, month_counts = Counter(), Counter()
+    for category_id, month, count in db.session.execute(facets):
+        category_counts[category_id] += count
+        month_counts[month] += count
+    names = ExpenseCategoryMultiton.names(category_counts)
+
+    return SearchResult(
+        expenses[:page_size],
+        next_cursor,
+        sum(category_counts.values()),
+        [(names[category_id], count) for category_id, count in category_counts.most_common()],
+        sorted(month_counts.items(), reverse=True),
+    )
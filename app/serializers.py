@@ -0,0 +1,14 @@
+# Fields of an expense in JSON responses
+EXPENSE_FIELDS = ("id", "name", "amount", "category", "date")
+
+
+def serialize_expense(expense, fields=EXPENSE_FIELDS):
+    """Turn an expense into a JSON-serializable dict restricted to `fields`."""
+    values = {
+        "id": expense.id,
+        "name": expense.name,
+        "amount": expense.amount,
+        "category": expense.category,
+        "date": str(expense.date),
+    }
+    return {field: values[field] for field in fields}
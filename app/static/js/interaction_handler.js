@@ -12,6 +12,7 @@ document.addEventListener("DOMContentLoaded", function () {
     // Prevent Duplicate Submissions
     const formsWithSubmitButtons = [
         { formId: "add-expense-form", buttonId: "add-expense-submit-button" },
+        { formId: "import-expenses-form", buttonId: "import-expenses-submit-button" },
         { formId: "edit-expense-form", buttonId: "edit-expense-submit-button" },
         { formId: "login-form", buttonId: "login-submit-button" },
         { formId: "register-form", buttonId: "register-submit-button" },
@@ -35,4 +36,164 @@ document.addEventListener("DOMContentLoaded", function () {
             });
         }
     });
+
+    // Lazy Loading of Expenses
+    const loadMoreContainer = document.getElementById("load-more-expenses");
+    const expensesTableBody = document.getElementById("expenses-table-body");
+
+    if (loadMoreContainer && expensesTableBody) {
+        const loadMoreButton = document.getElementById("load-more-expenses-button");
+        const loadMoreError = document.getElementById("load-more-expenses-error");
+        let loading = false;
+
+        const createActionForm = (url, method, label) => {
+            const form = document.createElement("form");
+            form.action = url;
+            form.method = method;
+            form.style.display = "inline";
+            const button = document.createElement("button");
+            button.type = "submit";
+            button.textContent = label;
+            form.appendChild(button);
+            return form;
+        };
+
+        const appendExpenseRow = (expense) => {
+            const row = document.createElement("tr");
+            [expense.name, expense.amount, expense.category, expense.date].forEach((value) => {
+                const cell = document.createElement("td");
+                cell.textContent = value;
+                row.appendChild(cell);
+            });
+            const actions = document.createElement("td");
+            actions.appendChild(createActionForm(expense.delete_url, "post", "Delete"));
+            actions.appendChild(createActionForm(expense.edit_url, "get", "Edit"));
+            row.appendChild(actions);
+            expensesTableBody.appendChild(row);
+        };
+
+        const loadMoreExpenses = () => {
+            const nextUrl = loadMoreContainer.dataset.nextUrl;
+            if (loading || !nextUrl) {
+                return;
+            }
+            loading = true;
+            loadMoreButton.disabled = true;
+            fetch(nextUrl, { headers: { Accept: "application/json" } })
+                .then((response) => {
+                    // An expired session is redirected to the login page, which is not a page of expenses
+                    if (response.redirected) {
+                        throw new Error("Your session has expired. Please log in again.");
+                    }
+                    if (!response.ok) {
+                        return response.json().catch(() => ({})).then((body) => {
+                            throw new Error(body.error || "Could not load more expenses.");
+                        });
+                    }
+                    return response.json();
+                })
+                .then((page) => {
+                    loadMoreError.hidden = true;
+                    page.expenses.forEach(appendExpenseRow);
+                    if (page.next_url) {
+                        loadMoreContainer.dataset.nextUrl = page.next_url;
+                        // Observe again so a marker that is still visible triggers the next page
+                        observer.unobserve(loadMoreContainer);
+                        observer.observe(loadMoreContainer);
+                    } else {
+                        // The last page has been loaded
+                        observer.disconnect();
+                        loadMoreContainer.remove();
+                    }
+                })
+                .catch((error) => {
+                    // Keep the button, so the user can try again. Network and parsing failures raise
+                    // TypeError and SyntaxError, whose messages are not meant for the user
+                    loadMoreError.textContent = error.name === "Error" ? error.message : "Could not load more expenses. Please try again.";
+                    loadMoreError.hidden = false;
+                })
+                .finally(() => {
+                    loading = false;
+                    loadMoreButton.disabled = false;
+                });
+        };
+
+        // Fetch the next page as soon as the end of the table scrolls into view
+        const observer = new IntersectionObserver((entries) => {
+            if (entries.some((entry) => entry.isIntersecting)) {
+                loadMoreExpenses();
+            }
+        });
+        observer.observe(loadMoreContainer);
+        loadMoreButton.addEventListener("click", loadMoreExpenses);
+    }
+
+    // Refresh Charts Drawn in the Background
+    const chartsUpdating = document.getElementById("charts-updating");
+
+    if (chartsUpdating) {
+        const charts = document.querySelectorAll("img.chart");
+        let attempts = 0;
+
+        // Until the server stops marking them as updating, fetch the charts again every second
+        const refreshCharts = () => {
+            attempts += 1;
+            Promise.all(Array.from(charts, (chart) =>
+                fetch(chart.dataset.src || chart.src, { cache: "no-cache" }).then((response) => {
+                    chart.dataset.src = chart.dataset.src || chart.src;
+                    // A chart still being drawn, or whose request failed, is fetched again on the next attempt
+                    if (!response.ok || response.headers.get("X-Chart-Updating")) {
+                        return false;
+                    }
+                    return response.blob().then((image) => {
+                        chart.src = URL.createObjectURL(image);
+                        return true;
+                    });
+                })
+            )).catch(() => [false]).then((refreshed) => {
+                if (refreshed.every(Boolean) || attempts >= 10) {
+                    chartsUpdating.remove();
+                } else {
+                    setTimeout(refreshCharts, 1000);
+                }
+            });
+        };
+        setTimeout(refreshCharts, 1000);
+    }
+
+    // Spending Insights
+    const insights = document.getElementById("spending-insights");
+
+    if (insights) {
+        const money = (value) => "$" + Math.abs(value).toFixed(2);
+        fetch(insights.dataset.url).then((response) => response.ok ? response.json() : null).then((analytics) => {
+            if (!analytics) {
+                return;
+            }
+            const projection = analytics.projection;
+            if (projection.spent > 0) {
+                let text = `At this pace you will spend about ${money(projection.projected)} this month.`;
+                if (projection.projected_overrun > 0) {
+                    text += ` That is ${money(projection.projected_overrun)} over your budget.`;
+                    insights.classList.add("over-budget");
+                }
+                document.getElementById("insights-projection").textContent = text;
+            }
+
+            const changes = analytics.monthly.change_percent;
+            const change = changes[changes.length - 1];
+            if (change !== undefined && change !== null) {
+                const months = analytics.monthly.months;
+                document.getElementById("insights-month-change").textContent =
+                    `Spending in ${months[months.length - 1]} was ${Math.abs(change).toFixed(0)}% ${change >= 0 ? "higher" : "lower"} than the month before.`;
+            }
+
+            const rising = analytics.category_trends.reduce((top, trend) => (!top || trend.slope > top.slope ? trend : top), null);
+            if (rising && rising.slope > 0) {
+                document.getElementById("insights-trend").textContent =
+                    `${rising.category} spending is rising the fastest, by about ${money(rising.slope)} a month.`;
+            }
+            insights.hidden = false;
+        });
+    }
 });
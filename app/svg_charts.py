@@ -0,0 +1,145 @@
+import math
+from xml.sax.saxutils import escape
+
+# Colors of matplotlib's "Paired" colormap, used for the pie slices
+PAIRED = (
+    "#a6cee3", "#1f78b4", "#b2df8a", "#33a02c", "#fb9a99", "#e31a1c",
+    "#fdbf6f", "#ff7f00", "#cab2d6", "#6a3d9a", "#ffff99", "#b15928",
+)
+
+# Color stops of matplotlib's "Blues" colormap, used for the bars
+BLUES = (
+    (0xf7, 0xfb, 0xff), (0xde, 0xeb, 0xf7), (0xc6, 0xdb, 0xef), (0x9e, 0xca, 0xe1), (0x6b, 0xae, 0xd6),
+    (0x42, 0x92, 0xc6), (0x21, 0x71, 0xb5), (0x08, 0x51, 0x9c), (0x08, 0x30, 0x6b),
+)
+
+FONT = 'font-family="DejaVu Sans, Verdana, sans-serif"'
+
+
+def group_small_categories(category_data, threshold=5):
+    """
+    Fold the categories below `threshold` percent of the total spending into a single "Other" slice.
+    Return the labels and sizes of the slices.
+    """
+    overall = sum(item.total for item in category_data)
+    slices = {}
+    for item in category_data:
+        label = item.category if item.total / overall * 100 > threshold else "Other"
+        slices[label] = slices.get(label, 0) + item.total
+    return list(slices), list(slices.values())
+
+
+def paired_color(value):
+    """Return the "Paired" color at `value` between 0 and 1."""
+    return PAIRED[min(int(value * len(PAIRED)), len(PAIRED) - 1)]
+
+
+def blues_color(value):
+    """Return the "Blues" color at `value` between 0 and 1, interpolated between the stops."""
+    position = value * (len(BLUES) - 1)
+    index = min(int(position), len(BLUES) - 2)
+    fraction = position - index
+    low, high = BLUES[index], BLUES[index + 1]
+    return "#" + "".join(f"{round(a + (b - a) * fraction):02x}" for a, b in zip(low, high))
+
+
+def linspace(start, stop, count):
+    """Return `count` evenly spaced values from `start` to `stop`, like numpy.linspace."""
+    if count == 1:
+        return [start]
+    return [start + (stop - start) * i / (count - 1) for i in range(count)]
+
+
+def svg_document(width, height, elements):
+    """Wrap the elements in an SVG document of the given size and return it as UTF-8 bytes."""
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" width="{width}" height="{height}">'
+        f'<rect width="{width}" height="{height}" fill="#fff"/>'
+        + "".join(elements)
+        + "</svg>"
+    ).encode("utf-8")
+
+
+def text(x, y, content, size, anchor="middle", extra=""):
+    """Return an SVG text element."""
+    return f'<text x="{x:.1f}" y="{y:.1f}" font-size="{size}" text-anchor="{anchor}" {FONT}{extra}>{escape(str(content))}</text>'
+
+
+def create_pie_chart(category_data):
+    """Generates a pie chart showing category spending distribution, as SVG."""
+    labels, sizes = group_small_categories(category_data)
+    overall = sum(sizes)
+    colors = [paired_color(value) for value in linspace(0, 1, len(labels))]
+    cx, cy, radius = 330, 320, 200
+
+    elements = [text(400, 40, "Category Spending Distribution", 19)]
+    angle = 140  # Start angle, in degrees counterclockwise from the x axis, like matplotlib
+    largest = max(sizes)
+    for label, size, color in zip(labels, sizes, colors):
+        span = size / overall * 360
+        middle = math.radians(angle + span / 2)
+        # Explode the largest slice outwards
+        offset = 0.1 * radius if size == largest else 0
+        x0, y0 = cx + offset * math.cos(middle), cy - offset * math.sin(middle)
+
+        if span >= 359.999:
+            elements.append(f'<circle cx="{x0:.1f}" cy="{y0:.1f}" r="{radius}" fill="{color}"/>')
+        else:
+            start, end = math.radians(angle), math.radians(angle + span)
+            elements.append(
+                f'<path d="M{x0:.1f},{y0:.1f} '
+                f'L{x0 + radius * math.cos(start):.1f},{y0 - radius * math.sin(start):.1f} '
+                f'A{radius},{radius} 0 {int(span > 180)} 0 '
+                f'{x0 + radius * math.cos(end):.1f},{y0 - radius * math.sin(end):.1f} Z" fill="{color}"/>'
+            )
+
+        # Percentage inside the slice and the category name outside of it
+        elements.append(text(x0 + 0.6 * radius * math.cos(middle), y0 - 0.6 * radius * math.sin(middle) + 5, f"{size / overall * 100:.1f}%", 14))
+        anchor = "start" if math.cos(middle) >= 0 else "end"
+        elements.append(text(x0 + 1.1 * radius * math.cos(middle), y0 - 1.1 * radius * math.sin(middle) + 5, label, 14, anchor))
+        angle += span
+
+    # Legend in the lower right corner
+    top = 580 - 22 * len(labels)
+    for i, (label, color) in enumerate(zip(labels, colors)):
+        elements.append(f'<rect x="620" y="{top + 22 * i}" width="20" height="12" fill="{color}"/>')
+        elements.append(text(648, top + 22 * i + 11, label, 14, "start"))
+    return svg_document(800, 600, elements)
+
+
+def create_bar_chart(months, totals):
+    """Generates a bar chart comparing monthly expenses, as SVG."""
+    left, right, top, bottom = 90, 970, 60, 480
+    y_max = max(totals) + 100
+    # Ticks every 100 like the matplotlib chart, widened to keep at most 12 of them
+    step = 100
+    while y_max / step > 12:
+        step *= 2.5 if str(step)[0] == "2" else 2
+    scale = (bottom - top) / y_max
+
+    elements = [text((left + right) / 2, 35, "Monthly Expense Comparison", 19)]
+    tick = 0
+    while tick <= y_max:
+        y = bottom - tick * scale
+        elements.append(f'<line x1="{left}" y1="{y:.1f}" x2="{right}" y2="{y:.1f}" stroke="#b0b0b0" stroke-dasharray="4 3" stroke-opacity="0.7"/>')
+        elements.append(text(left - 8, y + 5, f"{tick:g}", 14, "end"))
+        tick += step
+
+    slot = (right - left) / len(totals)
+    colors = [blues_color(value) for value in linspace(0.4, 1, len(totals))]
+    for i, (month, total, color) in enumerate(zip(months, totals, colors)):
+        center = left + slot * (i + 0.5)
+        height = total * scale
+        elements.append(
+            f'<rect x="{center - 0.4 * slot:.1f}" y="{bottom - height:.1f}" width="{0.8 * slot:.1f}" '
+            f'height="{height:.1f}" fill="{color}" stroke="#000"/>'
+        )
+        # Value on top of the bar, and the month below the axis
+        elements.append(text(center, bottom - (total + 10) * scale - 2, f"{total:.2f}", 12.5))
+        elements.append(text(center, bottom + 16, month, 14, "end", f' transform="rotate(-45 {center:.1f} {bottom + 16})"'))
+
+    elements.append(f'<line x1="{left}" y1="{bottom}" x2="{right}" y2="{bottom}" stroke="#000"/>')
+    elements.append(f'<line x1="{left}" y1="{top}" x2="{left}" y2="{bottom}" stroke="#000"/>')
+    elements.append(text((left + right) / 2, 590, "Month", 17))
+    elements.append(text(25, (top + bottom) / 2, "Total Spending", 17, extra=f' transform="rotate(-90 25 {(top + bottom) / 2})"'))
+    return svg_document(1000, 600, elements)
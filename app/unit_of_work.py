@@ -0,0 +1,30 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from .extensions import db
+
+
+def after_commit(callback, session=None):
+    """
+    Run the callback once the current transaction of the session (the request's by default) commits.
+    Requests stage all their changes and commit once; side effects that must not
+    happen for a rolled back request (waking the mail worker, dropping cached charts)
+    are registered here instead of being run straight away.
+    """
+    (session or db.session).info.setdefault("after_commit", []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def run_after_commit_callbacks(session):
+    """Run the callbacks registered for the transaction that just committed."""
+    if session.in_nested_transaction():
+        return # Only a savepoint was released; the transaction may still roll back
+    for callback in session.info.pop("after_commit", []):
+        callback()
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_after_commit_callbacks(session):
+    """The transaction did not commit, so its callbacks must never run."""
+    if session.in_nested_transaction():
+        return # Only a savepoint was rolled back; the transaction may still commit
+    session.info.pop("after_commit", None)
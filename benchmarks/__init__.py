@@ -0,0 +1 @@
+"""Benchmarks, load tests and the synthetic data they run against. See the "Benchmarks" section of the README."""
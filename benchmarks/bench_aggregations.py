@@ -0,0 +1,37 @@
+"""Micro-benchmarks of the queries behind the view expenses page."""
+from app.aggregations import get_expense_summary, get_expense_total
+from app.pagination import get_expense_page
+from app.rollups import compute_rollups
+from app.extensions import db
+from app.utils import get_category_data, get_monthly_data
+
+
+def bench_expense_summary(benchmark, user_id):
+    benchmark(get_expense_summary, user_id)
+
+
+def bench_expense_total(benchmark, user_id):
+    benchmark(get_expense_total, user_id)
+
+
+def bench_monthly_data(benchmark, user_id):
+    benchmark(get_monthly_data, user_id)
+
+
+def bench_category_data(benchmark, user_id):
+    benchmark(get_category_data, user_id)
+
+
+def bench_first_expense_page(benchmark, user_id):
+    benchmark(get_expense_page, user_id, None, 50)
+
+
+def bench_deep_expense_page(benchmark, user_id):
+    # Keyset pagination should cost the same however deep the page is
+    _, cursor = get_expense_page(user_id, None, 5000)
+    benchmark(get_expense_page, user_id, cursor, 50)
+
+
+def bench_compute_rollups_from_expenses(benchmark, user_id):
+    # What the summary would cost without the rollup table
+    benchmark(compute_rollups, db.session.connection(), user_id)
@@ -0,0 +1,33 @@
+"""Micro-benchmarks of the chart renderers, on the aggregates of the seeded users."""
+import pytest
+from app import charts, svg_charts
+from app.chart_cache import chart_cache
+from app.utils import get_category_data, get_monthly_data
+from .data import login
+
+RENDERERS = {"svg": svg_charts, "matplotlib": charts}
+
+
+@pytest.mark.parametrize("renderer", sorted(RENDERERS))
+def bench_pie_chart(benchmark, user_id, renderer):
+    category_data = get_category_data(user_id)
+    benchmark(RENDERERS[renderer].create_pie_chart, category_data)
+
+
+@pytest.mark.parametrize("renderer", sorted(RENDERERS))
+def bench_bar_chart(benchmark, user_id, renderer):
+    months, totals = get_monthly_data(user_id)
+    benchmark(RENDERERS[renderer].create_bar_chart, months, totals)
+
+
+@pytest.mark.parametrize("extension", ["svg", "png"])
+def bench_chart_route(benchmark, app, user_id, expense_count, extension):
+    # Whole request: rollup query, rendering and response, with the chart cache emptied before each round
+    client = app.test_client()
+    login(client, f"bench{expense_count}")
+
+    def request():
+        chart_cache.clear()
+        return client.get(f"/expenses/chart/pie.{extension}")
+
+    assert benchmark(request).status_code == 200
@@ -0,0 +1,152 @@
+"""
+Benchmark the chart renderers: per-render latency and peak RSS.
+
+Compares the previous pyplot implementation ("pyplot"), the object-oriented
+matplotlib renderer with per-thread figure reuse ("pooled") and the SVG renderer
+("svg"). Each variant runs in its own process so its peak RSS is measured alone.
+
+Usage: python benchmarks/chart_render.py [--renders 200] [--threads 1] [--variants pyplot pooled svg]
+"""
+import argparse
+import io
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.aggregations import CategoryTotal  # noqa: E402
+
+CATEGORY_DATA = [
+    CategoryTotal("Food", 540.25), CategoryTotal("Rent", 1200.0), CategoryTotal("Transport", 130.4),
+    CategoryTotal("Entertainment", 85.0), CategoryTotal("Utilities", 210.9), CategoryTotal("Misc", 20.5),
+]
+MONTHS = [f"2024-{month:02d}" for month in range(1, 13)]
+TOTALS = [1100.0 + 37.5 * month for month in range(12)]
+
+
+def pyplot_renderers():
+    """The chart functions as they were before the object-oriented rewrite, drawing through pyplot."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import numpy as np
+
+    def create_pie_chart(category_data):
+        labels = [item.category for item in category_data]
+        sizes = [item.total for item in category_data]
+        threshold = 5
+        labels, sizes = zip(
+            *(
+                (label, size) if size / sum(sizes) * 100 > threshold else ("Other", size)
+                for label, size in zip(labels, sizes)
+            )
+        )
+        plt.figure(FigureClass=plt.Figure, figsize=(8, 6))
+        colors = plt.cm.Paired(np.linspace(0, 1, len(set(labels))))
+        plt.pie(
+            sizes, labels=labels, autopct="%1.1f%%", startangle=140, shadow=True, colors=colors,
+            explode=[0.1 if size == max(sizes) else 0 for size in sizes],
+        )
+        plt.title("Category Spending Distribution", fontsize=14, pad=20)
+        plt.axis("equal")
+        plt.legend(loc="lower right", bbox_to_anchor=(0.64, -0.1, 0.5, 0.5), fontsize=10)
+        plt.tight_layout()
+        buffer = io.BytesIO()
+        plt.savefig(buffer, format="png")
+        plt.close()
+        return buffer.getvalue()
+
+    def create_bar_chart(months, totals):
+        plt.figure(FigureClass=plt.Figure, figsize=(10, 6))
+        colors = plt.cm.Blues(np.linspace(0.4, 1, len(totals)))
+        plt.bar(months, totals, color=colors, edgecolor="black")
+        plt.xlabel("Month", fontsize=12)
+        plt.xticks(rotation=45, ha="right")
+        plt.ylabel("Total Spending", fontsize=12)
+        plt.ylim(0, max(totals) + 100)
+        plt.yticks(np.arange(0, max(totals) + 100, step=100))
+        plt.title("Monthly Expense Comparison", fontsize=14)
+        for i, total in enumerate(totals):
+            plt.text(i, total + 10, f"{total:.2f}", ha="center", fontsize=9)
+        plt.grid(axis="y", linestyle="--", alpha=0.7)
+        img = io.BytesIO()
+        plt.savefig(img, format="png")
+        plt.close()
+        return img.getvalue()
+
+    return create_pie_chart, create_bar_chart
+
+
+def load_renderers(variant):
+    """Return the pie and bar chart functions of a variant."""
+    if variant == "pyplot":
+        return pyplot_renderers()
+    if variant == "pooled":
+        from app.charts import create_bar_chart, create_pie_chart
+        return create_pie_chart, create_bar_chart
+    from app.svg_charts import create_bar_chart, create_pie_chart
+    return create_pie_chart, create_bar_chart
+
+
+def run_variant(variant, renders, threads):
+    """Render `renders` pie and bar chart pairs per thread and print the statistics of this process."""
+    create_pie_chart, create_bar_chart = load_renderers(variant)
+    # Warm up imports and font caches outside of the measurement
+    create_pie_chart(CATEGORY_DATA)
+    create_bar_chart(MONTHS, TOTALS)
+
+    latencies = []
+    lock = threading.Lock()
+
+    def worker():
+        timings = []
+        for _ in range(renders):
+            started = time.perf_counter()
+            create_pie_chart(CATEGORY_DATA)
+            create_bar_chart(MONTHS, TOTALS)
+            timings.append((time.perf_counter() - started) * 1000 / 2)
+        with lock:
+            latencies.extend(timings)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # kB on Linux
+    print(
+        f"{variant:<8} renders={len(latencies) * 2:<6} mean={statistics.mean(latencies):8.2f}ms "
+        f"p50={latencies[len(latencies) // 2]:8.2f}ms p95={latencies[int(len(latencies) * 0.95)]:8.2f}ms "
+        f"throughput={len(latencies) * 2 / elapsed:9.1f}/s peak_rss={peak_rss:7.1f}MB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--renders", type=int, default=200, help="Chart pairs rendered per thread.")
+    parser.add_argument("--threads", type=int, default=1, help="Threads rendering concurrently.")
+    parser.add_argument("--variants", nargs="+", choices=["pyplot", "pooled", "svg"], default=["pyplot", "pooled", "svg"])
+    parser.add_argument("--variant", help=argparse.SUPPRESS)  # Set in the child processes
+    args = parser.parse_args()
+
+    if args.variant:
+        run_variant(args.variant, args.renders, args.threads)
+        return
+    for variant in args.variants:
+        subprocess.run(
+            [sys.executable, __file__, "--variant", variant, "--renders", str(args.renders), "--threads", str(args.threads)],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import os
+import pytest
+from app.extensions import db
+from .data import create_benchmark_app, seed_user
+from .stubs import start_stubs
+
+# Number of expenses of the seeded users; set BENCH_SIZES=100,10000,1000000 for the full range
+SIZES = [int(size) for size in os.environ.get("BENCH_SIZES", "100,10000").split(",")]
+
+
+def pytest_generate_tests(metafunc):
+    if "expense_count" in metafunc.fixturenames:
+        metafunc.parametrize("expense_count", SIZES)
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """The application on a temporary SQLite database (or BENCH_DATABASE_URI), talking to the local API and SMTP stubs."""
+    rates_server, smtp_server, config = start_stubs()
+    database_uri = os.environ.get("BENCH_DATABASE_URI") or f"sqlite:///{tmp_path_factory.mktemp('db')}/bench.db"
+    app = create_benchmark_app(database_uri, CHART_PRERENDER=False, **config)
+    yield app
+    rates_server.shutdown()
+    smtp_server.shutdown()
+
+
+@pytest.fixture(scope="session")
+def seeded_users(app):
+    """User IDs by expense count, seeded on first use and shared by every benchmark."""
+    users = {}
+
+    def get(expense_count):
+        if expense_count not in users:
+            with app.app_context():
+                users[expense_count] = seed_user(f"bench{expense_count}", expense_count, seed=expense_count)
+        return users[expense_count]
+
+    return get
+
+
+@pytest.fixture
+def user_id(app, seeded_users, expense_count):
+    """A user with `expense_count` expenses, inside an application context."""
+    user_id = seeded_users(expense_count)
+    with app.app_context():
+        yield user_id
+        db.session.remove()
@@ -0,0 +1,116 @@
+"""
+Seeded synthetic data for benchmarks.
+
+Every user gets the same expenses for the same seed and size, so runs of
+different commits are comparable. Expenses are built with ExpenseFactory and
+inserted in batches through the importer, which keeps the rollups and the
+budget total in step exactly like a real import.
+"""
+import random
+from datetime import date, timedelta
+from app import create_app
+from app.extensions import bcrypt, db
+from app.factories.expense_factory import ExpenseFactory
+from app.importers import insert_expenses
+from app.models import Budget, User
+
+PASSWORD = "benchmark"
+LAST_DAY = date(2024, 12, 31) # Expenses are spread over the months before this date
+
+# Category, relative frequency, typical amount and expense names
+CATEGORIES = (
+    ("Food", 30, 25, ("Groceries", "Restaurant", "Coffee", "Takeout")),
+    ("Transport", 20, 15, ("Bus pass", "Fuel", "Taxi", "Parking")),
+    ("Entertainment", 12, 40, ("Cinema", "Concert", "Streaming", "Games")),
+    ("Utilities", 10, 90, ("Electricity", "Internet", "Water", "Phone")),
+    ("Shopping", 10, 60, ("Clothes", "Electronics", "Books", "Home")),
+    ("Health", 8, 50, ("Pharmacy", "Dentist", "Gym")),
+    ("Rent", 5, 1400, ("Rent",)),
+    ("Misc", 5, 20, ("Gift", "Donation", "Other")),
+)
+
+
+def create_benchmark_app(database_uri, **config):
+    """
+    Create the application on the database, creating its tables, with the settings
+    benchmarks need (no CSRF, mail worker off unless enabled). Return the app.
+    """
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": database_uri,
+        "SECRET_KEY": "benchmark",
+        "WTF_CSRF_ENABLED": False,
+        "MAIL_WORKER_ENABLED": False,
+        "MAIL_DEFAULT_SENDER": "benchmark@localhost",
+        **config,
+    })
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def generate_expenses(count, seed=0, months=24):
+    """Yield `count` (name, amount, category, date) tuples drawn from a random generator seeded with `seed`."""
+    rng = random.Random(seed)
+    weights = [weight for _, weight, _, _ in CATEGORIES]
+    days = months * 30
+    for _ in range(count):
+        category, _, typical, names = rng.choices(CATEGORIES, weights)[0]
+        amount = round(max(0.5, rng.lognormvariate(0, 0.5) * typical), 2)
+        yield rng.choice(names), amount, category, LAST_DAY - timedelta(days=rng.randrange(days))
+
+
+def seed_user(username, expense_count, seed=0, monthly_limit=2500.0, batch_size=10000):
+    """
+    Create an active user with a budget and `expense_count` generated expenses. Return the user ID.
+    Must be called inside an application context.
+    """
+    user = User(
+        username=username,
+        email=f"{username}@example.com",
+        password=bcrypt.generate_password_hash(PASSWORD).decode("utf-8"),
+        active=True,
+    )
+    db.session.add(user)
+    db.session.flush()
+    db.session.add(Budget(user_id=user.id, monthly_limit=monthly_limit, current_expense_total=0, alert_sent=False))
+    db.session.commit()
+    user_id = user.id
+
+    batch = []
+    for name, amount, category, expense_date in generate_expenses(expense_count, seed):
+        expense = ExpenseFactory.create_expense(name, amount, category, expense_date, user_id=user_id)
+        batch.append({"name": expense.name, "amount": expense.amount, "category_id": expense.category_id, "date": expense.date, "user_id": user_id})
+        if len(batch) == batch_size:
+            insert_expenses(user_id, batch)
+            batch = []
+    if batch:
+        insert_expenses(user_id, batch)
+    return user_id
+
+
+def login(client, username):
+    """Log the test client in as a seeded user."""
+    response = client.post("/auth/login", data={"email": f"{username}@example.com", "password": PASSWORD})
+    if response.status_code != 302:
+        raise RuntimeError(f"Could not log in as {username}")
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Seed users for `python -m benchmarks.load --url ...`.")
+    parser.add_argument("--database-uri", required=True, help="Database of the server under test.")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--expenses", type=int, default=1000, help="Expenses of each user.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    app = create_benchmark_app(args.database_uri)
+    with app.app_context():
+        for index in range(args.users):
+            # Named like the users the load driver logs in as
+            seed_user(f"load{args.expenses}_{index}", args.expenses, seed=args.seed + index)
+    print(f"Seeded {args.users} users with {args.expenses} expenses each; their password is {PASSWORD!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+End-to-end load driver.
+
+Replays a weighted mix of page views, API calls, chart downloads and expense
+writes from several concurrent users, then reports the p50/p95/p99 latency and
+the database queries per request of every scenario. Query counts are read from
+the Server-Timing header, so they are available against a remote server too.
+
+In-process, against a temporary SQLite database seeded on the fly and the local
+API and SMTP stubs:
+
+    python -m benchmarks.load --users 4 --expenses 10000 --requests 1000 --concurrency 4
+
+Against a running server whose database was seeded with `python -m benchmarks.data`:
+
+    python -m benchmarks.load --url http://127.0.0.1:5000 --users 4 --expenses 10000
+"""
+import argparse
+import random
+import re
+import statistics
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from app.extensions import db
+from .data import create_benchmark_app, login, seed_user
+from .stubs import start_stubs
+
+QUERY_COUNT = re.compile(r'db;[^,]*desc="[^"(]*\((\d+)\)"')
+
+# Name, weight and request of each scenario
+SCENARIOS = (
+    ("view_expenses", 30, lambda client, rng: client.get("/expenses/view")),
+    ("expense_page", 15, lambda client, rng: client.get("/expenses/page?limit=50")),
+    ("api_expenses", 10, lambda client, rng: client.get("/api/expenses?limit=50&fields=id,amount,date")),
+    ("api_summary", 10, lambda client, rng: client.get("/api/expenses/summary")),
+    ("pie_chart", 10, lambda client, rng: client.get("/expenses/chart/pie.svg")),
+    ("monthly_chart", 10, lambda client, rng: client.get("/expenses/chart/monthly.svg")),
+    ("convert_currency", 5, lambda client, rng: client.post("/expenses/view", data={"from_currency": "CAD", "to_currency": rng.choice(["USD", "EUR", "GBP"])})),
+    ("add_expense", 10, lambda client, rng: client.post("/expenses/add", data={
+        "name": "Load test", "amount": f"{rng.uniform(1, 80):.2f}", "category": rng.choice(["Food", "Transport", "Misc"]),
+        "date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+    })),
+)
+
+
+class HTTPClient:
+    """Minimal stand-in for the Flask test client that talks to a running server."""
+
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+
+    def get(self, path):
+        return self.session.get(self.base_url + path, allow_redirects=False)
+
+    def post(self, path, data):
+        return self.session.post(self.base_url + path, data=data, allow_redirects=False)
+
+
+def percentile(values, fraction):
+    """Return the value below which `fraction` of the sorted values fall."""
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(make_client, usernames, requests_total, concurrency, seed):
+    """Send `requests_total` requests from `concurrency` threads and return the results by scenario."""
+    results = defaultdict(list) # Maps a scenario to (latency, queries, ok) tuples.
+    lock = threading.Lock()
+    remaining = [requests_total]
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        client = make_client()
+        login(client, usernames[index % len(usernames)])
+        weights = [weight for _, weight, _ in SCENARIOS]
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            name, _, send = rng.choices(SCENARIOS, weights)[0]
+            started = time.perf_counter()
+            response = send(client, rng)
+            latency = time.perf_counter() - started
+            match = QUERY_COUNT.search(response.headers.get("Server-Timing", ""))
+            with lock:
+                results[name].append((latency, int(match.group(1)) if match else 0, response.status_code < 400))
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def report(results, elapsed):
+    """Print the latency percentiles and queries per request of each scenario."""
+    print(f"{'scenario':<18}{'requests':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries/req':>13}")
+    everything = []
+    for name, _, _ in SCENARIOS:
+        samples = results.get(name)
+        if not samples:
+            continue
+        everything.extend(samples)
+        latencies = sorted(latency * 1000 for latency, _, _ in samples)
+        print(
+            f"{name:<18}{len(samples):>9}{sum(not ok for _, _, ok in samples):>8}"
+            f"{percentile(latencies, 0.50):>10.1f}{percentile(latencies, 0.95):>10.1f}{percentile(latencies, 0.99):>10.1f}"
+            f"{statistics.mean(queries for _, queries, _ in samples):>13.1f}"
+        )
+    latencies = sorted(latency * 1000 for latency, _, _ in everything)
+    print(
+        f"{'all':<18}{len(everything):>9}{sum(not ok for _, _, ok in everything):>8}"
+        f"{percentile(latencies, 0.50):>10.1f}{percentile(latencies, 0.95):>10.1f}{percentile(latencies, 0.99):>10.1f}"
+        f"{statistics.mean(queries for _, queries, _ in everything):>13.1f}"
+    )
+    print(f"{len(everything)} requests in {elapsed:.1f}s, {len(everything) / elapsed:.1f} requests/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running server; in-process with the Flask test client if omitted.")
+    parser.add_argument("--users", type=int, default=4, help="Number of seeded users to spread the load over.")
+    parser.add_argument("--expenses", type=int, default=1000, help="Expenses of each seeded user.")
+    parser.add_argument("--requests", type=int, default=500, help="Total number of requests to send.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Number of concurrent clients.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the data generator and the request mix.")
+    args = parser.parse_args()
+
+    usernames = [f"load{args.expenses}_{index}" for index in range(args.users)]
+    if args.url:
+        results, elapsed = run(lambda: HTTPClient(args.url), usernames, args.requests, args.concurrency, args.seed)
+        report(results, elapsed)
+        return
+
+    rates_server, smtp_server, config = start_stubs()
+    with tempfile.TemporaryDirectory() as directory:
+        # Deliver the queued alert emails to the SMTP stub while the load runs
+        app = create_benchmark_app(f"sqlite:///{directory}/load.db", MAIL_WORKER_ENABLED=True, **config)
+        with app.app_context():
+            started = time.perf_counter()
+            for index, username in enumerate(usernames):
+                seed_user(username, args.expenses, seed=args.seed + index)
+            print(f"Seeded {args.users} users with {args.expenses} expenses each in {time.perf_counter() - started:.1f}s")
+
+        results, elapsed = run(app.test_client, usernames, args.requests, args.concurrency, args.seed)
+        report(results, elapsed)
+        print(f"{len(smtp_server.messages)} emails delivered to the SMTP stub")
+        with app.app_context():
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
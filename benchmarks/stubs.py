@@ -0,0 +1,96 @@
+"""Local stand-ins for the exchange-rate API and the SMTP server, so benchmarks never leave the machine."""
+import json
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Value of one unit of each currency in CAD
+RATES = {"CAD": 1.0, "USD": 1.37, "EUR": 1.49, "GBP": 1.74, "JPY": 0.0092, "INR": 0.016}
+
+
+class ExchangeRateHandler(BaseHTTPRequestHandler):
+    """Answers `/<key>/latest/<base>` like the ExchangeRate API does."""
+
+    def do_GET(self):
+        base = self.path.rstrip("/").rsplit("/", 1)[-1].upper()
+        if base not in RATES:
+            body = {"result": "error", "error-type": "unsupported-code"}
+        else:
+            body = {"result": "success", "base_code": base, "conversion_rates": {code: RATES[base] / value for code, value in RATES.items()}}
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Accepts every message and keeps it in the server's `messages` list."""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+    def handle(self):
+        self.reply("220 benchmark SMTP stub")
+        in_data, lines = False, []
+        for raw in self.rfile:
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            if in_data:
+                if line == ".":
+                    self.server.messages.append("\n".join(lines))
+                    in_data, lines = False, []
+                    self.reply("250 OK")
+                else:
+                    lines.append(line)
+                continue
+            command = line[:4].upper()
+            if command in ("EHLO", "HELO"):
+                self.reply("250 stub")
+            elif command == "DATA":
+                in_data = True
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+class SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, SMTPHandler)
+        self.messages = []
+
+
+def serve(server):
+    """Serve in a daemon thread and return the server."""
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_stubs():
+    """
+    Start the exchange-rate API and SMTP stubs on free local ports.
+    Return the servers and the config that points the application at them.
+    """
+    rates_server = serve(ThreadingHTTPServer(("127.0.0.1", 0), ExchangeRateHandler))
+    smtp_server = serve(SMTPServer(("127.0.0.1", 0)))
+    config = {
+        "EXCHANGE_RATE_API_URL": f"http://127.0.0.1:{rates_server.server_address[1]}",
+        "API_KEY": "benchmark",
+        "MAIL_SERVER": "127.0.0.1",
+        "MAIL_PORT": smtp_server.server_address[1],
+        "MAIL_USE_TLS": False,
+        "MAIL_USE_SSL": False,
+        "MAIL_USERNAME": None,
+        "MAIL_PASSWORD": None,
+        "MAIL_SUPPRESS_SEND": False,
+    }
+    return rates_server, smtp_server, config
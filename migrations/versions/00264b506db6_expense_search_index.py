@@ -0,0 +1,64 @@
+"""expense search index
+
+Revision ID: 00264b506db6
+Revises: fbf6d9df2c13
+Create Date: 2026-10-18 19:42:37.905214
+
+Adds the full-text index of expense names and categories: on SQLite a
+contentless FTS5 table kept in sync by triggers and filled from the existing
+expenses, on PostgreSQL a GIN index over their tsvector. Other databases are
+searched without an index.
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '00264b506db6'
+down_revision = 'fbf6d9df2c13'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_UPGRADE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS expenses_fts USING fts5("
+    "name, category, owner, content='', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    """CREATE TRIGGER IF NOT EXISTS expenses_fts_insert AFTER INSERT ON expenses BEGIN
+        INSERT INTO expenses_fts(rowid, name, category, owner) VALUES (new.id, new.name, new.category, 'u' || new.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS expenses_fts_delete AFTER DELETE ON expenses BEGIN
+        INSERT INTO expenses_fts(expenses_fts, rowid, name, category, owner) VALUES ('delete', old.id, old.name, old.category, 'u' || old.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS expenses_fts_update AFTER UPDATE OF name, category, user_id ON expenses BEGIN
+        INSERT INTO expenses_fts(expenses_fts, rowid, name, category, owner) VALUES ('delete', old.id, old.name, old.category, 'u' || old.user_id);
+        INSERT INTO expenses_fts(rowid, name, category, owner) VALUES (new.id, new.name, new.category, 'u' || new.user_id);
+    END""",
+    # Fill the index from scratch, so databases that already have it end up with the same entries
+    "INSERT INTO expenses_fts(expenses_fts) VALUES ('delete-all')",
+    "INSERT INTO expenses_fts(rowid, name, category, owner) SELECT id, name, category, 'u' || user_id FROM expenses",
+)
+
+SQLITE_DOWNGRADE = (
+    "DROP TRIGGER IF EXISTS expenses_fts_update",
+    "DROP TRIGGER IF EXISTS expenses_fts_delete",
+    "DROP TRIGGER IF EXISTS expenses_fts_insert",
+    "DROP TABLE IF EXISTS expenses_fts",
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_UPGRADE:
+            op.execute(statement)
+    elif dialect == 'postgresql':
+        op.execute("CREATE INDEX IF NOT EXISTS ix_expenses_search ON expenses USING gin (to_tsvector('simple', name || ' ' || category))")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_DOWNGRADE:
+            op.execute(statement)
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_expenses_search")
@@ -0,0 +1,46 @@
+"""mail outbox
+
+Revision ID: 002e997f1022
+Revises: 6a0a2d640cc6
+Create Date: 2026-10-18 12:21:54.380961
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '002e997f1022'
+down_revision = '6a0a2d640cc6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    # Earlier versions created missing tables with `db.create_all()` on startup
+    if not inspector.has_table('mail_outbox'):
+        op.create_table('mail_outbox',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('subject', sa.String(length=255), nullable=False),
+            sa.Column('sender', sa.String(length=150), nullable=False),
+            sa.Column('recipients', sa.Text(), nullable=False),
+            sa.Column('body', sa.Text(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('attempts', sa.Integer(), nullable=False),
+            sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+            sa.Column('last_error', sa.Text(), nullable=True),
+            sa.Column('sent_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+    indexes = {index['name'] for index in inspector.get_indexes('mail_outbox')}
+    if 'ix_mail_outbox_pending' not in indexes:
+        with op.batch_alter_table('mail_outbox') as batch_op:
+            batch_op.create_index('ix_mail_outbox_pending', ['sent_at', 'next_attempt_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('mail_outbox') as batch_op:
+        batch_op.drop_index('ix_mail_outbox_pending')
+    op.drop_table('mail_outbox')
@@ -0,0 +1,78 @@
+"""expense rollups
+
+Revision ID: 6a0a2d640cc6
+Revises: e0832d46495b
+Create Date: 2026-10-18 11:03:27.604118
+
+Adds the per user, month and category spending rollups and fills them from
+the existing expenses. Afterwards `flask expenses rebuild-rollups --check`
+verifies that they agree with the expenses table.
+
+"""
+from collections import defaultdict
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a0a2d640cc6'
+down_revision = 'e0832d46495b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('expense_rollups'):
+        op.create_table('expense_rollups',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('month', sa.String(length=7), nullable=False),
+            sa.Column('category', sa.String(length=50), nullable=False),
+            sa.Column('total', sa.Numeric(precision=14, scale=2), nullable=False),
+            sa.Column('count', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('user_id', 'month', 'category')
+        )
+    else:
+        # Earlier versions created missing tables with `db.create_all()` on startup; such
+        # a table only holds the expense changes made since, so it is recounted below
+        op.execute('DELETE FROM expense_rollups')
+
+    rollups = sa.table('expense_rollups',
+        sa.column('user_id', sa.Integer()),
+        sa.column('month', sa.String()),
+        sa.column('category', sa.String()),
+        sa.column('total', sa.Numeric()),
+        sa.column('count', sa.Integer()),
+    )
+
+    # Sum per day in the database and fold the days into months here, which
+    # avoids a dialect specific month expression
+    expenses = sa.table('expenses',
+        sa.column('user_id', sa.Integer()),
+        sa.column('date', sa.Date()),
+        sa.column('category', sa.String()),
+        sa.column('amount', sa.Numeric()),
+    )
+    daily_totals = op.get_bind().execute(
+        sa.select(
+            expenses.c.user_id, expenses.c.date, expenses.c.category,
+            sa.func.sum(expenses.c.amount), sa.func.count(),
+        ).group_by(expenses.c.user_id, expenses.c.date, expenses.c.category)
+    )
+    monthly_totals = defaultdict(lambda: [0, 0])
+    for user_id, date, category, total, count in daily_totals:
+        key = (user_id, str(date)[:7], category)
+        monthly_totals[key][0] += total
+        monthly_totals[key][1] += count
+
+    if monthly_totals:
+        op.bulk_insert(rollups, [
+            {'user_id': user_id, 'month': month, 'category': category, 'total': total, 'count': count}
+            for (user_id, month, category), (total, count) in monthly_totals.items()
+        ])
+
+
+def downgrade():
+    op.drop_table('expense_rollups')
@@ -0,0 +1,66 @@
+"""initial schema
+
+Revision ID: a56ef7b76c7b
+Revises: 
+Create Date: 2026-10-18 09:12:40.115204
+
+Databases created before migrations were introduced already contain these
+tables (they were created by `db.create_all()`), so each table is only
+created when it is missing.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a56ef7b76c7b'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('users'):
+        op.create_table('users',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('username', sa.String(length=150), nullable=False),
+            sa.Column('email', sa.String(length=150), nullable=False),
+            sa.Column('password', sa.String(length=150), nullable=False),
+            sa.Column('active', sa.Boolean(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('username')
+        )
+        op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+    if not inspector.has_table('expenses'):
+        op.create_table('expenses',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('amount', sa.Float(), nullable=False),
+            sa.Column('category', sa.String(length=50), nullable=False),
+            sa.Column('date', sa.String(length=50), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+    if not inspector.has_table('budgets'):
+        op.create_table('budgets',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('monthly_limit', sa.Float(), nullable=False),
+            sa.Column('current_expense_total', sa.Float(), nullable=True),
+            sa.Column('alert_sent', sa.Boolean(), nullable=True),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade():
+    op.drop_table('budgets')
+    op.drop_table('expenses')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_table('users')
@@ -0,0 +1,160 @@
+"""category table
+
+Revision ID: bf483326e5f8
+Revises: 00264b506db6
+Create Date: 2026-10-18 21:16:52.417308
+
+Moves the expense category names into their own `categories` table and
+replaces the `category` string of expenses and rollups with an integer
+`category_id` referencing it. The full-text search index keeps its entries;
+its SQLite triggers now look the category name up, and the PostgreSQL index
+covers the expense name only, as categories are matched in their own table.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bf483326e5f8'
+down_revision = '00264b506db6'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_TRIGGERS = (
+    "DROP TRIGGER IF EXISTS expenses_fts_update",
+    "DROP TRIGGER IF EXISTS expenses_fts_delete",
+    "DROP TRIGGER IF EXISTS expenses_fts_insert",
+)
+
+SQLITE_UPGRADE = (
+    """CREATE TRIGGER IF NOT EXISTS expenses_fts_insert AFTER INSERT ON expenses BEGIN
+        INSERT INTO expenses_fts(rowid, name, category, owner) VALUES (new.id, new.name, (SELECT name FROM categories WHERE id = new.category_id), 'u' || new.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS expenses_fts_delete AFTER DELETE ON expenses BEGIN
+        INSERT INTO expenses_fts(expenses_fts, rowid, name, category, owner) VALUES ('delete', old.id, old.name, (SELECT name FROM categories WHERE id = old.category_id), 'u' || old.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS expenses_fts_update AFTER UPDATE OF name, category_id, user_id ON expenses BEGIN
+        INSERT INTO expenses_fts(expenses_fts, rowid, name, category, owner) VALUES ('delete', old.id, old.name, (SELECT name FROM categories WHERE id = old.category_id), 'u' || old.user_id);
+        INSERT INTO expenses_fts(rowid, name, category, owner) VALUES (new.id, new.name, (SELECT name FROM categories WHERE id = new.category_id), 'u' || new.user_id);
+    END""",
+)
+
+SQLITE_DOWNGRADE = (
+    """CREATE TRIGGER IF NOT EXISTS expenses_fts_insert AFTER INSERT ON expenses BEGIN
+        INSERT INTO expenses_fts(rowid, name, category, owner) VALUES (new.id, new.name, new.category, 'u' || new.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS expenses_fts_delete AFTER DELETE ON expenses BEGIN
+        INSERT INTO expenses_fts(expenses_fts, rowid, name, category, owner) VALUES ('delete', old.id, old.name, old.category, 'u' || old.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS expenses_fts_update AFTER UPDATE OF name, category, user_id ON expenses BEGIN
+        INSERT INTO expenses_fts(expenses_fts, rowid, name, category, owner) VALUES ('delete', old.id, old.name, old.category, 'u' || old.user_id);
+        INSERT INTO expenses_fts(rowid, name, category, owner) VALUES (new.id, new.name, new.category, 'u' || new.user_id);
+    END""",
+)
+
+
+def has_search_table(bind):
+    """Return whether the SQLite full-text search table exists."""
+    return sa.inspect(bind).has_table('expenses_fts')
+
+
+def drop_search_triggers(bind):
+    """Drop the search triggers or index reading the category column, which the rebuilt expenses table would break."""
+    if bind.dialect.name == 'sqlite':
+        for statement in SQLITE_TRIGGERS:
+            op.execute(statement)
+    elif bind.dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_expenses_search")
+
+
+def create_rollups_table(category_column, *constraints):
+    """Create the rollups table keyed by the given category column."""
+    return op.create_table('expense_rollups',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('month', sa.String(length=7), nullable=False),
+        category_column,
+        sa.Column('total', sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        *constraints,
+        sa.PrimaryKeyConstraint('user_id', 'month', category_column.name)
+    )
+
+
+def upgrade():
+    bind = op.get_bind()
+    # Earlier versions created missing tables with `db.create_all()` on startup, so it may exist, empty
+    if not sa.inspect(bind).has_table('categories'):
+        op.create_table('categories',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=50), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('name')
+        )
+    op.execute("INSERT INTO categories (name) SELECT DISTINCT category FROM expenses WHERE category NOT IN (SELECT name FROM categories)")
+
+    drop_search_triggers(bind)
+    with op.batch_alter_table('expenses') as batch_op:
+        batch_op.add_column(sa.Column('category_id', sa.Integer(), nullable=True))
+    op.execute("UPDATE expenses SET category_id = (SELECT id FROM categories WHERE categories.name = expenses.category)")
+    with op.batch_alter_table('expenses') as batch_op:
+        batch_op.alter_column('category_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_foreign_key('fk_expenses_category_id_categories', 'categories', ['category_id'], ['id'])
+        batch_op.drop_index('ix_expenses_user_id_category')
+        batch_op.drop_column('category')
+        batch_op.create_index('ix_expenses_user_id_category_id', ['user_id', 'category_id'], unique=False)
+
+    # Rollups hold a single row per user, month and category, so rebuilding their table in memory is cheap
+    rollups = bind.execute(sa.text(
+        "SELECT r.user_id, r.month, c.id, r.total, r.count FROM expense_rollups r JOIN categories c ON c.name = r.category"
+    )).all()
+    op.drop_table('expense_rollups')
+    table = create_rollups_table(
+        sa.Column('category_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['category_id'], ['categories.id']),
+    )
+    if rollups:
+        op.bulk_insert(table, [
+            {'user_id': user_id, 'month': month, 'category_id': category_id, 'total': total, 'count': count}
+            for user_id, month, category_id, total, count in rollups
+        ])
+
+    if bind.dialect.name == 'sqlite' and has_search_table(bind):
+        for statement in SQLITE_UPGRADE:
+            op.execute(statement)
+    elif bind.dialect.name == 'postgresql':
+        op.execute("CREATE INDEX IF NOT EXISTS ix_expenses_search ON expenses USING gin (to_tsvector('simple', name))")
+
+
+def downgrade():
+    bind = op.get_bind()
+    drop_search_triggers(bind)
+    with op.batch_alter_table('expenses') as batch_op:
+        batch_op.add_column(sa.Column('category', sa.String(length=50), nullable=True))
+    op.execute("UPDATE expenses SET category = (SELECT name FROM categories WHERE categories.id = expenses.category_id)")
+    with op.batch_alter_table('expenses') as batch_op:
+        batch_op.alter_column('category', existing_type=sa.String(length=50), nullable=False)
+        batch_op.drop_index('ix_expenses_user_id_category_id')
+        batch_op.drop_constraint('fk_expenses_category_id_categories', type_='foreignkey')
+        batch_op.drop_column('category_id')
+        batch_op.create_index('ix_expenses_user_id_category', ['user_id', 'category'], unique=False)
+
+    rollups = bind.execute(sa.text(
+        "SELECT r.user_id, r.month, c.name, r.total, r.count FROM expense_rollups r JOIN categories c ON c.id = r.category_id"
+    )).all()
+    op.drop_table('expense_rollups')
+    table = create_rollups_table(sa.Column('category', sa.String(length=50), nullable=False))
+    if rollups:
+        op.bulk_insert(table, [
+            {'user_id': user_id, 'month': month, 'category': category, 'total': total, 'count': count}
+            for user_id, month, category, total, count in rollups
+        ])
+    op.drop_table('categories')
+
+    if bind.dialect.name == 'sqlite' and has_search_table(bind):
+        for statement in SQLITE_DOWNGRADE:
+            op.execute(statement)
+    elif bind.dialect.name == 'postgresql':
+        op.execute("CREATE INDEX IF NOT EXISTS ix_expenses_search ON expenses USING gin (to_tsvector('simple', name || ' ' || category))")
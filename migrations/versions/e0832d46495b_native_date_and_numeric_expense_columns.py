@@ -0,0 +1,67 @@
+"""native date and numeric expense columns
+
+Revision ID: e0832d46495b
+Revises: a56ef7b76c7b
+Create Date: 2026-10-18 09:47:03.528911
+
+Converts `expenses.date` from a string to DATE and `expenses.amount` from a
+float to NUMERIC(12, 2), and adds the (user_id, date) and (user_id, category)
+indexes every per-user query can range scan.
+
+Run `flask expenses backfill` first so every stored date is in ISO
+"YYYY-MM-DD" form; the conversion cannot parse anything else.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e0832d46495b'
+down_revision = 'a56ef7b76c7b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    columns = {column['name']: column for column in sa.inspect(bind).get_columns('expenses')}
+    indexes = {index['name'] for index in sa.inspect(bind).get_indexes('expenses')}
+
+    # SQLite keeps dates as ISO text either way, and the CAST to DATE of an
+    # altered column would truncate them to the year, so there the table is
+    # rebuilt with the column declared as DATE and its values copied unchanged
+    sqlite_date = bind.dialect.name == 'sqlite' and not isinstance(columns['date']['type'], sa.Date)
+    with op.batch_alter_table('expenses',
+            recreate='always' if sqlite_date else 'auto',
+            reflect_args=[sa.Column('date', sa.Date(), nullable=False)] if sqlite_date else ()) as batch_op:
+        if not isinstance(columns['date']['type'], sa.Date) and bind.dialect.name != 'sqlite':
+            batch_op.alter_column('date',
+                existing_type=sa.String(length=50),
+                type_=sa.Date(),
+                existing_nullable=False,
+                postgresql_using='date::date')
+        if not isinstance(columns['amount']['type'], sa.Numeric) or isinstance(columns['amount']['type'], sa.Float):
+            batch_op.alter_column('amount',
+                existing_type=sa.Float(),
+                type_=sa.Numeric(precision=12, scale=2),
+                existing_nullable=False,
+                postgresql_using='round(amount::numeric, 2)')
+        if 'ix_expenses_user_id_date' not in indexes:
+            batch_op.create_index('ix_expenses_user_id_date', ['user_id', 'date'], unique=False)
+        if 'ix_expenses_user_id_category' not in indexes:
+            batch_op.create_index('ix_expenses_user_id_category', ['user_id', 'category'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('expenses') as batch_op:
+        batch_op.drop_index('ix_expenses_user_id_category')
+        batch_op.drop_index('ix_expenses_user_id_date')
+        batch_op.alter_column('amount',
+            existing_type=sa.Numeric(precision=12, scale=2),
+            type_=sa.Float(),
+            existing_nullable=False)
+        batch_op.alter_column('date',
+            existing_type=sa.Date(),
+            type_=sa.String(length=50),
+            existing_nullable=False)
@@ -0,0 +1,52 @@
+"""budget month tracking
+
+Revision ID: fbf6d9df2c13
+Revises: 002e997f1022
+Create Date: 2026-10-18 19:05:12.318406
+
+Adds the spending of the tracked calendar month to the budgets, filled in
+from the rollups for the current month. Afterwards `flask budgets rollover`
+starts each new month.
+
+"""
+from datetime import date
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'fbf6d9df2c13'
+down_revision = '002e997f1022'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('budgets') as batch_op:
+        batch_op.add_column(sa.Column('month', sa.String(length=7), nullable=True))
+        batch_op.add_column(sa.Column('month_total', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('projection_alert_sent', sa.Boolean(), nullable=True))
+
+    budgets = sa.table('budgets',
+        sa.column('user_id', sa.Integer()),
+        sa.column('month', sa.String()),
+        sa.column('month_total', sa.Float()),
+        sa.column('projection_alert_sent', sa.Boolean()),
+    )
+    rollups = sa.table('expense_rollups',
+        sa.column('user_id', sa.Integer()),
+        sa.column('month', sa.String()),
+        sa.column('total', sa.Numeric()),
+    )
+    month = date.today().strftime('%Y-%m')
+    month_total = sa.select(sa.func.coalesce(sa.func.sum(rollups.c.total), 0)).where(
+        rollups.c.user_id == budgets.c.user_id, rollups.c.month == month
+    ).scalar_subquery()
+    op.execute(budgets.update().values(month=month, month_total=month_total, projection_alert_sent=False))
+
+
+def downgrade():
+    with op.batch_alter_table('budgets') as batch_op:
+        batch_op.drop_column('projection_alert_sent')
+        batch_op.drop_column('month_total')
+        batch_op.drop_column('month')
@@ -0,0 +1 @@
+"""Tests of the application. See the "Tests" section of the README."""
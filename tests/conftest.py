@@ -0,0 +1,63 @@
+import itertools
+import pytest
+from app import create_app
+from app.extensions import bcrypt, db
+from app.models import Budget, User
+
+PASSWORD = "test"
+# Every test gets its own user, so tests sharing the database never see each other's expenses
+user_numbers = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """The application on a temporary SQLite database, with mail delivery and background chart rendering off."""
+    return create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path_factory.mktemp('db')}/test.db",
+        "SECRET_KEY": "test",
+        "TESTING": True,
+        "WTF_CSRF_ENABLED": False,
+        "MAIL_WORKER_ENABLED": False,
+        "MAIL_DEFAULT_SENDER": "test@localhost",
+        "CHART_PRERENDER": False,
+    })
+
+
+def create_user():
+    """Create an active user with a budget. Return the user ID. Must be called inside an application context."""
+    username = f"user{next(user_numbers)}"
+    user = User(
+        username=username,
+        email=f"{username}@example.com",
+        password=bcrypt.generate_password_hash(PASSWORD).decode("utf-8"),
+        active=True,
+    )
+    db.session.add(user)
+    db.session.flush()
+    db.session.add(Budget(user_id=user.id, monthly_limit=10000.0, current_expense_total=0, alert_sent=False))
+    db.session.commit()
+    return user.id
+
+
+@pytest.fixture
+def user_id(app):
+    """A new user, inside an application context."""
+    with app.app_context():
+        yield create_user()
+        db.session.remove()
+
+
+@pytest.fixture
+def other_user_id(user_id):
+    """A second new user, e.g. to check that changes of the first leave it alone."""
+    return create_user()
+
+
+@pytest.fixture
+def client(app, user_id):
+    """A test client logged in as the user."""
+    client = app.test_client()
+    user = db.session.get(User, user_id)
+    response = client.post("/auth/login", data={"email": user.email, "password": PASSWORD})
+    assert response.status_code == 302
+    return client
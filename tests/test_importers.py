@@ -0,0 +1,113 @@
+import io
+from datetime import date
+import pytest
+from sqlalchemy import select
+from app.extensions import db
+from app.importers import ImportRowError, import_expenses, parse_csv, parse_ofx, validate_row
+from app.models import Budget, Expense
+from app.rollups import find_rollup_mismatches
+
+SGML_STATEMENT = b"""OFXHEADER:100
+DATA:OFXSGML
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20240105120000[-5:EST]
+<TRNAMT>-42.50
+<NAME>Grocer &amp; Co
+</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240106<TRNAMT>1000.00<NAME>Salary</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240107<TRNAMT>-7.25<MEMO>Coffee &lt;to go&gt;</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+# Cut off in the middle of its last transaction
+TRUNCATED_STATEMENT = SGML_STATEMENT[:SGML_STATEMENT.rindex(b"<STMTTRN>") + 40]
+
+XML_STATEMENT = b"""<?xml version="1.0" encoding="UTF-8"?>
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT</TRNTYPE><DTPOSTED>20240210</DTPOSTED><TRNAMT>-15.00</TRNAMT><NAME>Books &amp; more</NAME></STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+def expense_names(user_id):
+    return db.session.scalars(select(Expense.name).where(Expense.user_id == user_id).order_by(Expense.date)).all()
+
+
+def test_parse_csv_maps_column_aliases_and_skips_blank_rows():
+    rows = list(parse_csv(io.BytesIO(b"\xef\xbb\xbfDescription,Value,Category,Posted\nLunch,12.50,Food,2024-01-02\n,,,\nBus,3,Transport,2024-01-03\n")))
+
+    assert rows == [
+        {"name": "Lunch", "amount": "12.50", "category": "Food", "date": "2024-01-02"},
+        {"name": "Bus", "amount": "3", "category": "Transport", "date": "2024-01-03"},
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [7, 64 * 1024])
+def test_parse_ofx_yields_debits_with_decoded_entities(chunk_size):
+    rows = list(parse_ofx(io.BytesIO(SGML_STATEMENT), chunk_size=chunk_size))
+
+    assert rows == [
+        {"name": "Grocer & Co", "amount": "42.50", "category": "Imported", "date": "20240105"},
+        {"name": "Coffee <to go>", "amount": "7.25", "category": "Imported", "date": "20240107"},
+    ]
+
+
+def test_parse_ofx_reads_xml_statements():
+    rows = list(parse_ofx(io.BytesIO(XML_STATEMENT)))
+
+    assert rows == [{"name": "Books & more", "amount": "15.00", "category": "Imported", "date": "20240210"}]
+
+
+def test_parse_ofx_reports_a_truncated_transaction():
+    rows = list(parse_ofx(io.BytesIO(TRUNCATED_STATEMENT)))
+
+    assert [row["name"] for row in rows[:-1]] == ["Grocer & Co"]
+    assert isinstance(rows[-1], ImportRowError)
+
+
+@pytest.mark.parametrize("row, error", [
+    ({"name": "", "amount": "1", "category": "Food", "date": "2024-01-01"}, "missing name"),
+    ({"name": "Lunch", "amount": "1", "category": " ", "date": "2024-01-01"}, "missing category"),
+    ({"name": "Lunch", "amount": "ten", "category": "Food", "date": "2024-01-01"}, "invalid amount 'ten'"),
+    ({"name": "Lunch", "amount": "-3", "category": "Food", "date": "2024-01-01"}, "amount must be positive, got -3.0"),
+    ({"name": "Lunch", "amount": "1", "category": "Food", "date": "01/02/2024"}, "invalid date '01/02/2024'"),
+])
+def test_validate_row_rejects(row, error):
+    with pytest.raises(ImportRowError, match=error):
+        validate_row(row)
+
+
+def test_validate_row_reads_thousands_separators_and_ofx_dates(user_id):
+    values = validate_row({"name": " Rent ", "amount": "1,200.456", "category": "Housing", "date": "20240301"})
+
+    assert (values["name"], values["amount"], values["date"]) == ("Rent", 1200.46, date(2024, 3, 1))
+    db.session.rollback()
+
+
+def test_import_counts_accepted_and_rejected_rows(user_id):
+    csv = (
+        b"name,amount,category,date\n"
+        b"Lunch,12.50,Food,2024-01-02\n"
+        b"Refund,-5,Food,2024-01-03\n"
+        b"Bus,3,Transport,2024-01-04\n"
+        b"Cinema,9,Fun,not a date\n"
+        b"Books,20,Fun,2024-02-01\n"
+    )
+
+    result = import_expenses(user_id, parse_csv(io.BytesIO(csv)), batch_size=2)
+
+    assert (result.imported, result.skipped) == (3, 2)
+    assert result.errors == ["Row 2: amount must be positive, got -5.0", "Row 4: invalid date 'not a date'"]
+    assert expense_names(user_id) == ["Lunch", "Bus", "Books"]
+    assert db.session.scalar(select(Budget.current_expense_total).where(Budget.user_id == user_id)) == 35.5
+    assert find_rollup_mismatches(db.session.connection(), user_id) == []
+
+
+def test_import_reports_a_truncated_ofx_transaction_as_skipped(user_id):
+    result = import_expenses(user_id, parse_ofx(io.BytesIO(TRUNCATED_STATEMENT)))
+
+    assert (result.imported, result.skipped) == (1, 1)
+    assert result.errors == ["Row 2: transaction not closed before the end of the file"]
+    assert expense_names(user_id) == ["Grocer & Co"]
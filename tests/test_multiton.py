@@ -0,0 +1,90 @@
+from sqlalchemy import insert, select
+from app.extensions import db
+from app.models import Category
+from app.multiton import ExpenseCategoryMultiton
+from app.unit_of_work import after_commit
+
+
+def is_cached(name):
+    return name in ExpenseCategoryMultiton._instances
+
+
+def category_ids(name):
+    return db.session.scalars(select(Category.id).where(Category.name == name)).all()
+
+
+def test_new_category_is_cached_once_committed(user_id):
+    instance = ExpenseCategoryMultiton("Committed")
+
+    assert not is_cached("Committed")
+    assert ExpenseCategoryMultiton("Committed") is instance # Reused within the transaction, without a second insert
+    db.session.commit()
+
+    assert is_cached("Committed")
+    assert ExpenseCategoryMultiton("Committed") is instance
+    assert ExpenseCategoryMultiton.get(instance.id) is instance
+    assert category_ids("Committed") == [instance.id]
+
+
+def test_rolled_back_category_is_forgotten(user_id):
+    ExpenseCategoryMultiton("RolledBack")
+    db.session.rollback()
+
+    assert not is_cached("RolledBack")
+    assert "new_categories" not in db.session.info
+    assert category_ids("RolledBack") == []
+
+
+def test_released_savepoint_keeps_new_categories_pending(user_id):
+    instance = ExpenseCategoryMultiton("Savepoint")
+    with db.session.begin_nested():
+        pass # Releasing a savepoint fires after_commit, but nothing is committed yet
+
+    assert not is_cached("Savepoint")
+    assert ExpenseCategoryMultiton("Savepoint") is instance
+    db.session.rollback()
+
+    assert not is_cached("Savepoint")
+    assert category_ids("Savepoint") == []
+
+
+def test_rolled_back_savepoint_keeps_new_categories_pending(user_id):
+    instance = ExpenseCategoryMultiton("OuterSavepoint")
+    savepoint = db.session.begin_nested()
+    savepoint.rollback()
+
+    assert ExpenseCategoryMultiton("OuterSavepoint") is instance
+    db.session.commit()
+
+    assert is_cached("OuterSavepoint")
+    assert category_ids("OuterSavepoint") == [instance.id]
+
+
+def test_category_inserted_concurrently_is_reused(app, user_id):
+    # Committed by another connection after this request looked the name up and found nothing
+    with db.engine.begin() as connection:
+        category_id = connection.execute(insert(Category).values(name="Concurrent").returning(Category.id)).scalar_one()
+
+    instance = ExpenseCategoryMultiton._create("Concurrent")
+
+    assert instance.id == category_id
+    assert is_cached("Concurrent") # Already committed, so cached straight away
+    db.session.rollback()
+    assert category_ids("Concurrent") == [category_id]
+
+
+def test_after_commit_callbacks_wait_for_the_outermost_transaction(user_id):
+    calls = []
+    after_commit(lambda: calls.append("committed"))
+    with db.session.begin_nested():
+        pass
+
+    assert calls == []
+    db.session.commit()
+    assert calls == ["committed"]
+
+    db.session.execute(select(Category.id)) # Start the transaction the callback belongs to
+    after_commit(lambda: calls.append("rolled back"))
+    db.session.rollback()
+    db.session.commit()
+    assert calls == ["committed"]
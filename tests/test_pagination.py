@@ -0,0 +1,79 @@
+from datetime import date
+import pytest
+from app.extensions import db
+from app.models import Expense
+from app.multiton import ExpenseCategoryMultiton
+from app.pagination import InvalidCursor, decode_cursor, encode_cursor, get_expense_page
+
+
+@pytest.fixture
+def expense_ids(user_id):
+    """IDs of seven expenses of the user, in listing order (newest first), several of them sharing a date."""
+    category_id = ExpenseCategoryMultiton("Food").id
+    dates = [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 2), date(2024, 1, 2), date(2024, 1, 3), date(2024, 1, 3), date(2024, 1, 5)]
+    expenses = [Expense(name=f"Expense {i}", amount=1, category_id=category_id, date=day, user_id=user_id) for i, day in enumerate(dates)]
+    db.session.add_all(expenses)
+    db.session.commit()
+    return [expense.id for expense in sorted(expenses, key=lambda expense: (expense.date, expense.id), reverse=True)]
+
+
+def all_pages(user_id, page_size):
+    """Return the IDs on each page of the user's expenses, following the cursors to the last page."""
+    pages, cursor = [], None
+    while True:
+        expenses, cursor = get_expense_page(user_id, cursor, page_size)
+        pages.append([expense.id for expense in expenses])
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip(user_id, expense_ids):
+    expense = db.session.get(Expense, expense_ids[0])
+
+    assert decode_cursor(encode_cursor(expense)) == (expense.date, expense.id)
+
+
+@pytest.mark.parametrize("cursor", ["", "2024-01-02", "2024-01-02~", "2024-13-01~4", "2024-01-02~four", None])
+def test_invalid_cursors(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 7, 10])
+def test_pages_list_every_expense_once_in_order(user_id, expense_ids, page_size):
+    pages = all_pages(user_id, page_size)
+
+    assert [expense_id for page in pages for expense_id in page] == expense_ids
+    assert all(len(page) == page_size for page in pages[:-1])
+    assert 0 < len(pages[-1]) <= page_size
+
+
+def test_ties_on_the_date_are_broken_by_id(user_id, expense_ids):
+    # The first page ends in the middle of the three expenses dated 2024-01-02
+    expenses, cursor = get_expense_page(user_id, page_size=4)
+
+    assert cursor == f"2024-01-02~{expense_ids[3]}"
+    assert [expense.id for expense in get_expense_page(user_id, cursor, page_size=10)[0]] == expense_ids[4:]
+
+
+def test_expense_page_route(client, user_id, expense_ids):
+    page = client.get("/expenses/page?limit=3").get_json()
+    assert [expense["id"] for expense in page["expenses"]] == expense_ids[:3]
+    assert page["expenses"][0]["edit_url"] == f"/expenses/edit/{expense_ids[0]}"
+
+    # The next page keeps the requested limit
+    page = client.get(page["next_url"]).get_json()
+    assert [expense["id"] for expense in page["expenses"]] == expense_ids[3:6]
+
+    response = client.get("/expenses/page?cursor=not-a-cursor")
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Invalid cursor: 'not-a-cursor'"}
+
+
+def test_page_size_is_clamped(app, client, user_id, expense_ids):
+    app.config["EXPENSES_MAX_PAGE_SIZE"] = 5
+    try:
+        assert len(client.get("/api/expenses?limit=1000").get_json()["expenses"]) == 5
+        assert len(client.get("/api/expenses?limit=0").get_json()["expenses"]) == 1
+    finally:
+        del app.config["EXPENSES_MAX_PAGE_SIZE"]
@@ -0,0 +1,121 @@
+from datetime import date
+from sqlalchemy import insert, select
+from app.extensions import db
+from app.models import Category, Expense, ExpenseRollup
+from app.multiton import ExpenseCategoryMultiton
+from app.rollups import apply_deltas, find_rollup_mismatches
+
+
+def rollups(user_id):
+    """Return the user's rollup rows as a dict mapping (month, category name) to (total, count)."""
+    rows = db.session.execute(
+        select(ExpenseRollup.month, Category.name, ExpenseRollup.total, ExpenseRollup.count)
+        .join(Category, Category.id == ExpenseRollup.category_id)
+        .where(ExpenseRollup.user_id == user_id)
+    )
+    return {(month, name): (float(total), count) for month, name, total, count in rows}
+
+
+def add_expense(client, name, amount, category, expense_date):
+    response = client.post("/expenses/add", data={"name": name, "amount": amount, "category": category, "date": expense_date})
+    assert response.status_code == 302
+    return db.session.scalars(select(Expense.id).where(Expense.name == name).order_by(Expense.id.desc())).first()
+
+
+def edit_expense(client, expense_id, name, amount, category, expense_date):
+    response = client.post(f"/expenses/edit/{expense_id}", data={"name": name, "amount": amount, "category": category, "date": expense_date})
+    assert response.status_code == 302
+
+
+def test_add_expenses(client, user_id):
+    add_expense(client, "Groceries", 20, "Food", "2024-01-03")
+    add_expense(client, "Coffee", 4.5, "Food", "2024-01-20")
+    add_expense(client, "Rent", 900, "Rent", "2024-02-01")
+
+    assert rollups(user_id) == {("2024-01", "Food"): (24.5, 2), ("2024-02", "Rent"): (900, 1)}
+    assert find_rollup_mismatches(db.session.connection(), user_id) == []
+
+
+def test_edit_amount(client, user_id):
+    expense_id = add_expense(client, "Groceries", 20, "Food", "2024-01-03")
+    add_expense(client, "Coffee", 4.5, "Food", "2024-01-20")
+
+    edit_expense(client, expense_id, "Groceries", 35, "Food", "2024-01-03")
+
+    assert rollups(user_id) == {("2024-01", "Food"): (39.5, 2)}
+
+
+def test_edit_category_and_month(client, user_id):
+    expense_id = add_expense(client, "Groceries", 20, "Food", "2024-01-03")
+    add_expense(client, "Coffee", 4.5, "Food", "2024-01-20")
+
+    edit_expense(client, expense_id, "Groceries", 20, "Household", "2024-01-03")
+    assert rollups(user_id) == {("2024-01", "Food"): (4.5, 1), ("2024-01", "Household"): (20, 1)}
+
+    edit_expense(client, expense_id, "Groceries", 20, "Household", "2024-03-03")
+    assert rollups(user_id) == {("2024-01", "Food"): (4.5, 1), ("2024-03", "Household"): (20, 1)}
+    assert find_rollup_mismatches(db.session.connection(), user_id) == []
+
+
+def test_delete_removes_emptied_rows(client, user_id):
+    expense_id = add_expense(client, "Groceries", 20, "Food", "2024-01-03")
+    add_expense(client, "Rent", 900, "Rent", "2024-02-01")
+
+    assert client.post(f"/expenses/delete/{expense_id}").status_code == 302
+
+    assert rollups(user_id) == {("2024-02", "Rent"): (900, 1)}
+
+
+def test_delete_all(client, user_id):
+    add_expense(client, "Groceries", 20, "Food", "2024-01-03")
+    add_expense(client, "Rent", 900, "Rent", "2024-02-01")
+
+    assert client.post("/expenses/delete_all").status_code == 302
+
+    assert rollups(user_id) == {}
+
+
+def test_other_users_are_untouched(client, user_id, other_user_id):
+    add_expense(client, "Groceries", 20, "Food", "2024-01-03")
+    db.session.add(Expense(name="Lunch", amount=12, category_id=ExpenseCategoryMultiton("Food").id, date=date(2024, 1, 5), user_id=other_user_id))
+    db.session.commit()
+
+    assert client.post("/expenses/delete_all").status_code == 302
+
+    assert rollups(user_id) == {}
+    assert rollups(other_user_id) == {("2024-01", "Food"): (12, 1)}
+
+
+class ConcurrentInsert:
+    """
+    Connection wrapper inserting the rollup row right after the first UPDATE missed it,
+    as a concurrent request creating the same row would.
+    """
+
+    def __init__(self, connection, row):
+        self.connection = connection
+        self.row = row
+
+    def execute(self, statement, *args):
+        result = self.connection.execute(statement, *args)
+        if self.row is not None and statement.is_update:
+            self.connection.execute(insert(ExpenseRollup.__table__).values(**self.row))
+            self.row = None
+        return result
+
+    def begin_nested(self):
+        return self.connection.begin_nested()
+
+
+def test_apply_deltas_retries_the_update_after_losing_the_insert_race(user_id):
+    category_id = ExpenseCategoryMultiton("Food").id
+    db.session.commit()
+    connection = ConcurrentInsert(
+        db.session.connection(),
+        {"user_id": user_id, "month": "2024-01", "category_id": category_id, "total": 10, "count": 1},
+    )
+
+    apply_deltas(connection, {(user_id, "2024-01", category_id): [5, 1]})
+
+    assert rollups(user_id) == {("2024-01", "Food"): (15, 2)}
+    db.session.rollback()